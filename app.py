@@ -1,8 +1,15 @@
 import streamlit as st
-import json
-import requests
-import pandas as pd
-from io import BytesIO
+import os
+import time
+from occurus.balancer import KeyPool, split_keys
+from occurus.batch import OpenAIBatchTransport
+from occurus.cache import ResponseCache
+from occurus.client import DEFAULT_API_BASE
+from occurus.jobs import JobJournal, job_id_for
+from occurus.metrics import MetricsRecorder, recording
+from occurus.pipeline import NUMERIC_RESULT_COLUMNS, RESULT_COLUMNS, REVIEW_ADAPTIVE, REVIEW_SYSTEMATIC, iter_jobs, preflight, run_rows_concurrently, run_rows_in_batches
+from occurus.sheets import MIME_TYPES, OUTPUT_FORMATS, export_results, read_header, sheet_format
+from occurus.tokens import MAX_SOURCE_TOKENS, SOURCE_REJECT, SOURCE_TRUNCATE
 
 # Configuration de la page Streamlit
 st.set_page_config(
@@ -11,173 +18,227 @@ st.set_page_config(
     page_icon="🍒"
 )
 
-# Définir la fonction GPT35
-def GPT35(prompt, systeme, secret_key, temperature=0.7, model="gpt-4o-mini", max_tokens=1200):
-    url = "https://api.openai.com/v1/chat/completions"
-    
-    payload = {
-        "model": model,
-        "messages": [
-            {"role": "system", "content": systeme},
-            {"role": "user", "content": prompt}
-        ],
-        "temperature": temperature,
-        "max_tokens": max_tokens
-    }
-
-    headers = {
-        "Content-Type": "application/json",
-        "Authorization": f"Bearer {secret_key}"
-    }
-
-    response = requests.post(url, headers=headers, json=payload)
-    response_json = response.json()
-    return response_json['choices'][0]['message']['content'].strip()
-
-# Fonction pour ajouter des occurrences de mots
-def add_word_occurrences(existing_text, words_with_occurrences, secret_key, user_prompt, temperature):
-    prompt = (f"Voici le texte original :\n{existing_text}\n\n"
-              f"{user_prompt}\n\n"
-              f"Le texte doit rester naturel et cohérent. Tu es un expert en rédaction SEO.\n"
-              f"N'utilises jamais de * ou # dans le texte. Réponds uniquement avec le texte modifié.\n\n"
-              f"Brief pour la création de contenu :\n"
-              f"- Objectif principal : Le contenu doit informer et convaincre le public cible en répondant à ses besoins d’information et en mettant en valeur l’expertise de la marque ou du service. Il doit capter l’attention tout en soulignant les bénéfices du produit/service pour l’utilisateur.\n"
-              f"- Structure et optimisation SEO : Créer une structure claire avec un H2 principal accrocheur, naturel et engageant et des H3 sur les avantages secondaires. Intégrer les mots-clés principaux et des expressions pertinentes pour le SEO, en assurant une navigation facile dans le texte.\n"
-              f"- Contenu détaillé : Rédiger une introduction contextualisant le sujet et mettant en avant l’importance du produit/service. Structurer ensuite le contenu en segments thématiques pour fournir des informations utiles et pratiques (ex : caractéristiques, conseils d’utilisation, guide d'achat).\n"
-              f"- Ton et Style : Adapter le ton au public cible et refléter les valeurs de la marque. Utiliser un vocabulaire accessible, avec des explications claires pour les termes techniques si nécessaires.\n"
-              f"- Optimisation SEO et mots-clés : Intégrer des mots-clés pertinents et expressions de recherche pour maximiser la visibilité.\n\n"
-              f"Utilise ce brief pour structurer et optimiser le texte.")
-
-    system_message = ("Vous êtes un assistant de rédaction compétent et expérimenté, spécialisé dans le traitement naturel des textes. "
-                  "Vous êtes expert dans la création de contenus engageants, informatifs et persuasifs. "
-                  "Votre expertise en SEO vous permet d’intégrer efficacement les mots-clés et d'optimiser la structure des textes pour améliorer le référencement naturel. "
-                  "Vous structurez les contenus avec une hiérarchie claire, en utilisant des H1, H2, et H3, et en insérant les mots-clés de manière fluide pour un texte naturel et optimisé. "
-                  "Vous adaptez le ton et le style en fonction du public cible, et veillez à utiliser un vocabulaire accessible tout en expliquant les termes techniques si nécessaire. "
-                  "Vous respectez les consignes de SEO on-page, notamment l’utilisation de titres pertinents, et évitez l'usage de caractères spéciaux comme * ou #. "
-                  "Le texte doit être composé de 1 titre, puis 2 sous titres avec chacun 1 paragraphe."
-                  "N'utilise JAMAIS le terme introduction ou conclusion."
-                  "Votre priorité est de produire un contenu à la fois engageant pour les lecteurs et performant en termes de SEO.")
-    return GPT35(prompt, system_message, secret_key, temperature)
-
-# Fonction pour vérifier la cohérence des textes
-def review_content(text, secret_key, temperature):
-    review_prompt = (f"Voici le texte généré :\n{text}\n\n"
-                     f"Effectue une vérification et réécris le texte si nécessaire pour garantir la cohérence, l'uniformité et la correction des propos. "
-                     f"Assure-toi que le texte reste naturel, fluide et qu'il respecte les consignes de SEO. "
-                     f"Ne mentionnes pas de marque de vêtements ou de chaussures. "
-                     f"Ne parles pas de livraison, ne parles pas de frais de port, ne parles pas de carte cadeaux. "
-                     f"Supprime les répétitions et améliore le ton si besoin, tout en conservant le sens du texte original. "
-                     f"Supprime les majuscules en trop et inutiles sur les titres H2 et H3"
-                     f"Réponds uniquement avec le texte révisé sans ajout d'annotations ou d'indications.")
-    review_system_message = ("Vous êtes un assistant de révision expert, spécialisé dans l'optimisation et la cohérence des contenus générés par IA.")
-    return GPT35(review_prompt, review_system_message, secret_key, temperature)
-
-# Fonction pour calculer le score d'occurrences
-def calculate_occurrence_score(revised_text, words_with_occurrences):
-    total_required = sum(words_with_occurrences.values())
-    actual_count = sum(revised_text.lower().count(word.lower()) for word in words_with_occurrences.keys())
-    return round((actual_count / total_required) * 100, 2) if total_required > 0 else 0
-
 # Interface utilisateur avec Streamlit
 st.title('Création de textes SEO avec Occurus Rewrite')
 
-# Ajouter un champ pour la clé secrète OpenAI
-secret_key = st.text_input('Clé Secrète OpenAI', type="password")
+# Ajouter un champ pour la clé secrète OpenAI (plusieurs clés séparées par des virgules pour répartir la charge)
+secret_keys = split_keys(st.text_input('Clé(s) Secrète(s) OpenAI', type="password",
+                                       help="Plusieurs clés séparées par des virgules : chaque appel part sur la clé la moins chargée."))
+
+# Modèles utilisés quand toutes les clés ont atteint leur limite sur le modèle principal
+fallback_models = tuple(st.multiselect('Modèles de secours', ['gpt-4o', 'gpt-4.1-mini', 'gpt-4.1-nano']))
+
+# Durée de vie du pool (s) : une clé écartée (quota épuisé, refus) est réessayée après ce délai
+KEY_POOL_TTL = 15 * 60
+
+# Pool partagé entre les exécutions, pour garder les limites observées et les clés écartées.
+# Même une clé seule y passe, pour que ses appels soient espacés selon ses limites RPM/TPM.
+@st.cache_resource(ttl=KEY_POOL_TTL)
+def get_key_pool(keys, models):
+    return KeyPool(keys, models)
+
+secret_key = get_key_pool(tuple(secret_keys), fallback_models) if secret_keys else ""
+
+# API compatible OpenAI à utiliser, par exemple un serveur simulé (python -m occurus mock-server).
+# Elle est passée à chaque appel : le processus est partagé entre les sessions, une valeur globale enverrait
+# les requêtes (et la clé) d'une session vers l'URL saisie par une autre.
+api_base_url = st.text_input("URL de base de l'API", value=os.environ.get("OCCURUS_API_BASE") or DEFAULT_API_BASE)
 
 # Ajouter une barre de sélection pour la température
 temperature = st.slider('Sélectionnez la température', 0.0, 2.0, 0.7)
 
+# Nombre de lignes traitées en parallèle (chaque ligne enchaîne génération puis révision)
+max_workers = st.slider('Nombre de requêtes simultanées', 1, 32, 8)
+
+# Exécution interactive, ou hors ligne via l'API Batch (moins chère, résultats sous 24 h)
+execution_mode = st.radio("Mode d'exécution", ['Interactif', 'Batch (hors ligne)'], horizontal=True)
+batch_mode = execution_mode == 'Batch (hors ligne)'
+if batch_mode:
+    st.caption("En mode batch, chaque ligne est générée puis révisée systématiquement ; le cache n'est pas utilisé.")
+
+# Révision systématique, ou adaptative selon le score d'occurrences du premier jet
+review_mode_label = st.selectbox('Mode de révision', ['Systématique', 'Adaptative'])
+review_mode = REVIEW_ADAPTIVE if review_mode_label == 'Adaptative' else REVIEW_SYSTEMATIC
+if review_mode == REVIEW_ADAPTIVE:
+    score_threshold = st.slider("Score d'occurrences suffisant (%)", 50, 150, 100)
+    max_corrections = st.number_input('Nombre maximal de corrections ciblées', 0, 5, 2)
+else:
+    score_threshold, max_corrections = 100, 0
+
+# Cache disque des réponses, partagé entre les exécutions du script
+@st.cache_resource
+def get_response_cache():
+    return ResponseCache()
+
+# Ignorer le cache pour obtenir de nouveaux échantillons (utile à température élevée)
+bypass_cache = st.checkbox('Ignorer le cache (forcer de nouvelles réponses)', value=False)
+response_cache = None if bypass_cache else get_response_cache()
+
+# Textes sources plus longs que MAX_SOURCE_TOKENS : tronqués ou refusés avant l'envoi
+long_source_label = st.selectbox(f'Textes sources de plus de {MAX_SOURCE_TOKENS} tokens', ['Tronquer', 'Refuser la ligne'])
+source_policy = SOURCE_REJECT if long_source_label == 'Refuser la ligne' else SOURCE_TRUNCATE
+
+# Panneau de métriques : débit, latence des appels LLM, temps restant, erreurs et coût estimé
+def show_metrics(panel, metrics):
+    with panel.container():
+        throughput, latency, eta, errors = st.columns(4)
+        throughput.metric("Débit", f"{metrics['rows_per_minute']:.1f} lignes/min", f"{metrics['tokens_per_second']:.0f} tokens/s", delta_color="off")
+        latency.metric("Latence p50 / p95", f"{metrics['latency_p50_seconds']:.1f} s / {metrics['latency_p95_seconds']:.1f} s")
+        eta.metric("Temps restant estimé", f"{metrics['eta_seconds']:.0f} s" if metrics['eta_seconds'] is not None else "–")
+        errors.metric("Erreurs / nouvelles tentatives", f"{metrics['errors']} / {metrics['retries']}", f"{metrics['cost_usd']:.4f} $", delta_color="off")
+
+# Intervalle minimal entre deux rafraîchissements du panneau (s)
+METRICS_REFRESH = 1.0
+
+# Nombre maximal de lignes en erreur listées par la pré-validation
+MAX_ERRORS_SHOWN = 50
+
 # Layout pour les boutons d'import, d'exécution et de téléchargement
 col1, col2, col3 = st.columns(3)
 
 # Bouton pour charger le fichier
 with col1:
-    uploaded_file = st.file_uploader("Télécharger un fichier XLSX", type="xlsx", label_visibility="collapsed")
+    uploaded_file = st.file_uploader("Télécharger un fichier XLSX ou CSV", type=["xlsx", "csv"], label_visibility="collapsed")
+    output_format = st.selectbox('Format du fichier de sortie', OUTPUT_FORMATS)
 
 # Vérification que le fichier est chargé
 if uploaded_file:
-    df = pd.read_excel(uploaded_file)
+    source_format = sheet_format(uploaded_file.name)
+    columns = read_header(uploaded_file, source_format)
 
     # Vérification des colonnes
-    if 'keyword' in df.columns and 'Text or not' in df.columns and 'Occurrences' in df.columns:
-        df['Texte Modifié'] = ""  # Initialisation de la colonne pour les résultats
-        df['Texte Révisé'] = ""   # Colonne pour les textes après révision
-        df['Score Occurrences (%)'] = 0.0  # Colonne pour le score des occurrences
-
-        # Initialisation de la barre de progression et du texte de statut pour la création
-        creation_progress_bar = st.progress(0)
+    if 'keyword' in columns and 'Text or not' in columns and 'Occurrences' in columns:
+        # Reprendre les lignes déjà journalisées pour ce fichier
+        journal = JobJournal(job_id_for(uploaded_file.getvalue()))
+        journal_offsets, finished_rows = journal.scan()
+
+        # Pré-validation de toutes les lignes restantes avant le moindre appel : erreurs et doublons regroupés.
+        # Elle n'est refaite que si le fichier, les lignes restantes ou les réglages changent.
+        settings = (temperature, review_mode, score_threshold, int(max_corrections), batch_mode)
+        preflight_key = (journal.job_id, len(finished_rows), source_policy, settings)
+        if st.session_state.get('preflight_key') != preflight_key:
+            st.session_state['preflight'] = preflight(uploaded_file, source_format, finished_rows, source_policy, settings=settings)
+            st.session_state['preflight_key'] = preflight_key
+        report = st.session_state['preflight']
+
+        # Initialisation de la barre de progression et du texte de statut pour la création.
+        # Le total vient de la pré-validation, pour ne pas relire tout le tableur à chaque réexécution.
+        total_rows = report.rows + len(finished_rows)
+        creation_progress_bar = st.progress(min(1.0, len(finished_rows) / total_rows) if total_rows else 0)
         creation_status_text = st.empty()
-        total_rows = len(df)
+        metrics_panel = st.empty()
+        if finished_rows:
+            creation_status_text.text(f"{len(finished_rows)} textes déjà générés sur {total_rows}, le traitement reprendra à partir de ce point.")
+
+        if report.errors:
+            error_lines = [f"- {message}" for _, message in report.errors[:MAX_ERRORS_SHOWN]]
+            if len(report.errors) > MAX_ERRORS_SHOWN:
+                error_lines.append(f"- … et {len(report.errors) - MAX_ERRORS_SHOWN} autre(s)")
+            st.error(f"{len(report.errors)} ligne(s) seront ignorées :\n\n" + "\n".join(error_lines))
+        st.info(report.summary(1 if review_mode == REVIEW_ADAPTIVE and not batch_mode else 2))
 
         # Bouton pour lancer la création des textes
         with col2:
             start_processing = st.button("Lancer la création des textes")
+            if st.button("Repartir de zéro", disabled=not journal_offsets and journal.batch_state() is None):
+                journal.clear()
+                st.rerun()
+
+        # Des batchs déjà envoyés pour ce fichier (page rechargée, réexécution, crash) : reprendre leur suivi
+        # sans attendre le bouton, plutôt que de les laisser se terminer sans personne pour rapatrier les résultats
+        if batch_mode and not start_processing and journal.batch_state() is not None:
+            st.info("Des batchs envoyés précédemment pour ce fichier sont encore suivis : reprise de l'interrogation.")
+            start_processing = True
 
         if start_processing:
-            # Exécuter la modification pour chaque ligne
-            for index, row in df.iterrows():
-                main_keyword = row['keyword']
-                existing_text = row['Text or not'] if pd.notna(row['Text or not']) else ""
-                
-                # Charger les occurrences en JSON
-                try:
-                    words_with_occurrences = json.loads(row['Occurrences'])
-                except json.JSONDecodeError:
-                    st.error(f"Erreur de format JSON dans la ligne {index + 1}. Veuillez vérifier le format des occurrences.")
-                    continue
-
-                # Construire le prompt pour chaque ligne
-                user_prompt = (f"Veuillez rédiger un texte générique en ciblant le mot clé principal : {main_keyword}. "
-                               f"Incorporez naturellement les occurrences des mots suivants, sans forcer leur usage :\n"
-                               f"{words_with_occurrences}\n\n"
-                               f"Le texte doit être engageant, informatif et optimisé pour le SEO, avec un ton professionnel et fluide. "
-                               f"Rédigez en utilisant la troisième personne du singulier et évitez toute introduction ou conclusion superflue. "
-                               f"Assurez-vous de structurer le contenu avec les balises suivantes : "
-                               f"- <h2> pour le titre principal du texte, "
-                               f"- <h3> pour chaque sous-partie, et "
-                               f"- <p> pour chaque paragraphe de contenu.\n\n"
-                               f"N'utilisez jamais de caractères spéciaux comme * ou # dans le texte. Limitez-vous à un texte d'environ 300 mots. "
-                               f"Votre objectif est de produire un contenu clair et cohérent, qui respecte les bonnes pratiques SEO tout en étant naturel pour le lecteur. "
-                               f"Répondez uniquement avec le texte structuré selon ces consignes.")
-
-                # Afficher le statut actuel pour la création
-                creation_status_text.text(f"Texte généré {index + 1} sur {total_rows}")
-
-                # Appel de la fonction pour générer le texte modifié
-                modified_text = add_word_occurrences(existing_text, words_with_occurrences, secret_key, user_prompt, temperature)
-                df.at[index, 'Texte Modifié'] = modified_text
-
-                # Révision du texte
-                reviewed_text = review_content(modified_text, secret_key, temperature)
-                df.at[index, 'Texte Révisé'] = reviewed_text
-
-                # Calcul du score des occurrences
-                occurrence_score = calculate_occurrence_score(reviewed_text, words_with_occurrences)
-                df.at[index, 'Score Occurrences (%)'] = occurrence_score
-
-                # Mise à jour de la barre de progression
-                creation_progress_bar.progress((index + 1) / total_rows)
-
-            # Préparation du fichier modifié pour le téléchargement
-            output = BytesIO()
-            df.to_excel(output, index=False, engine='xlsxwriter')
-            output.seek(0)
+            # Les lignes sont relues bloc par bloc, une seule par groupe de doublons ; chaque résultat est
+            # journalisé dès qu'il est prêt, pour la ligne et ses doublons
+            jobs = iter_jobs(uploaded_file, source_format, finished_rows, source_policy=source_policy, only_rows=report.job_rows)
+            completed_rows = len(finished_rows)
+            failed_rows = []
+            metrics = MetricsRecorder(report.rows - len(report.errors))
+            if batch_mode:
+                def show_batch_status(stage, completed, failed, total):
+                    creation_status_text.text(f"Batch {stage.lower()} : {completed} terminées, {failed} en échec sur {total}")
+
+                row_results = run_rows_in_batches(list(jobs), temperature, OpenAIBatchTransport(secret_keys[0] if secret_keys else "", api_base_url),
+                                                  journal, show_batch_status, duplicates=report.duplicates)
+            else:
+                row_results = run_rows_concurrently(jobs, secret_key, temperature, max_workers, response_cache, journal,
+                                                    duplicates=report.duplicates,
+                                                    review_mode=review_mode, score_threshold=score_threshold,
+                                                    max_corrections=int(max_corrections), base_url=api_base_url)
+            last_refresh = 0.0
+            with recording(metrics):
+                for index, result in row_results:
+                    if result['Statut'] != "OK":
+                        failed_rows.append(index)
+
+                    # Mise à jour de la barre de progression au fil des lignes terminées
+                    completed_rows += 1
+                    metrics.record_row()
+                    creation_status_text.text(f"Texte généré {completed_rows} sur {total_rows}")
+                    creation_progress_bar.progress(min(1.0, completed_rows / total_rows))
+                    if time.monotonic() - last_refresh >= METRICS_REFRESH:
+                        show_metrics(metrics_panel, metrics.snapshot())
+                        last_refresh = time.monotonic()
+            show_metrics(metrics_panel, metrics.snapshot())
+            st.session_state['metrics_json'] = metrics.to_json()
+            st.session_state['metrics_prometheus'] = metrics.to_prometheus()
+
+            # Clés refusées ou routes indisponibles pendant le traitement
+            if isinstance(secret_key, KeyPool) and secret_key.disabled_routes():
+                st.warning("Écartées du pool : " + "; ".join(secret_key.disabled_routes()))
+
+            if failed_rows:
+                st.warning(f"{len(failed_rows)} ligne(s) en échec après plusieurs tentatives : {', '.join(str(i + 1) for i in sorted(failed_rows))}.")
+
+            # Tokens consommés, dont ceux servis par le cache de prompts d'OpenAI
+            if not batch_mode:
+                st.caption(metrics.usage_summary())
+
+            # Statistiques du cache pour cette instance
+            if response_cache is not None:
+                cache_stats = response_cache.stats()
+                st.caption(f"Cache : {cache_stats['hits']} réponses réutilisées, {cache_stats['misses']} appels à l'API, {cache_stats['entries']} entrées stockées.")
 
             # Clear the status message after completion
             creation_status_text.text("Traitement terminé.")
-        else:
-            output = None
+            journal_offsets, finished_rows = journal.scan()
+
+        # Préparation du fichier modifié pour le téléchargement, y compris un résultat partiel.
+        # L'export relit le tableur et le journal bloc par bloc ; il n'est refait que si le journal a changé.
+        output_path = None
+        if finished_rows:
+            export_key = (journal.job_id, journal.size(), output_format)
+            if st.session_state.get('export_key') != export_key:
+                output_path = os.path.join(os.path.dirname(journal.path), f"{journal.job_id}_export.{output_format}")
+                try:
+                    export_results(uploaded_file, source_format, output_path, output_format, RESULT_COLUMNS,
+                                   lambda index: journal.read(journal_offsets[index]) if index in journal_offsets else None,
+                                   numeric_columns=NUMERIC_RESULT_COLUMNS)
+                except ImportError as error:
+                    st.error(str(error))
+                    output_path = None
+                st.session_state['export_key'] = export_key if output_path else None
+                st.session_state['export_path'] = output_path
+            output_path = st.session_state.get('export_path')
 
         # Bouton pour télécharger le fichier modifié
         with col3:
-            if output:
-                st.download_button(
-                    label="Télécharger le fichier XLSX avec les textes révisés",
-                    data=output,
-                    file_name="Texte_Modifie_Et_Revise.xlsx",
-                    mime="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet"
-                )
+            if output_path:
+                with open(output_path, 'rb') as output:
+                    st.download_button(
+                        label=f"Télécharger le fichier {output_format.upper()} avec les textes révisés ({len(finished_rows)}/{total_rows})",
+                        data=output,
+                        file_name=f"Texte_Modifie_Et_Revise.{output_format}",
+                        mime=MIME_TYPES[output_format]
+                    )
+            # Métriques du dernier traitement, pour les tableaux de bord
+            if st.session_state.get('metrics_json'):
+                st.download_button("Métriques (JSON)", st.session_state['metrics_json'], file_name="occurus_metrics.json", mime="application/json")
+                st.download_button("Métriques (Prometheus)", st.session_state['metrics_prometheus'], file_name="occurus_metrics.prom", mime="text/plain")
     else:
-        st.error("Erreur : Le fichier XLSX doit contenir les colonnes 'keyword', 'Text or not', et 'Occurrences'.")
+        st.error("Erreur : Le fichier doit contenir les colonnes 'keyword', 'Text or not', et 'Occurrences'.")
 else:
-    st.write("Veuillez télécharger un fichier XLSX pour procéder.")
+    st.write("Veuillez télécharger un fichier XLSX ou CSV pour procéder.")
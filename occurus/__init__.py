@@ -0,0 +1,34 @@
+# Cœur d'Occurus Rewrite, indépendant de l'interface Streamlit.
+# Les sous-modules (et donc requests, pandas, openpyxl...) ne sont importés qu'au premier accès à un nom.
+from importlib import import_module
+
+_EXPORTS = {
+    "GPT35": "occurus.llm",
+    "add_word_occurrences": "occurus.llm",
+    "review_content": "occurus.llm",
+    "correct_missing_keywords": "occurus.llm",
+    "build_user_prompt": "occurus.prompts",
+    "calculate_occurrence_score": "occurus.scoring",
+    "score_occurrences": "occurus.scoring",
+    "rescore_column": "occurus.scoring",
+    "process_row": "occurus.pipeline",
+    "run_rows_concurrently": "occurus.pipeline",
+    "run_rows_in_batches": "occurus.pipeline",
+    "iter_jobs": "occurus.pipeline",
+    "preflight": "occurus.pipeline",
+    "LLMError": "occurus.client",
+    "ResponseCache": "occurus.cache",
+    "JobJournal": "occurus.jobs",
+    "MetricsRecorder": "occurus.metrics",
+    "KeyPool": "occurus.balancer",
+}
+
+__all__ = list(_EXPORTS)
+
+
+def __getattr__(name):
+    if name not in _EXPORTS:
+        raise AttributeError(f"module 'occurus' has no attribute {name!r}")
+    value = getattr(import_module(_EXPORTS[name]), name)
+    globals()[name] = value
+    return value
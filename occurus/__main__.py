@@ -0,0 +1,3 @@
+from occurus.cli import main
+
+raise SystemExit(main())
@@ -0,0 +1,183 @@
+import threading
+import time
+
+from occurus.client import LLMError, backoff_delay, parse_duration, server_retry_delay
+from occurus.tokens import count_tokens
+
+# Attente maximale entre deux examens du pool quand aucune route n'est disponible (s)
+WAIT_STEP = 1.0
+
+
+# Seau à jetons d'une limite par minute (requêtes ou tokens). La capacité est inconnue tant que
+# l'API ne l'a pas annoncée via x-ratelimit-limit-* : la route est alors considérée comme libre.
+class TokenBucket:
+    def __init__(self, capacity=None):
+        self.capacity = capacity
+        self.level = float(capacity or 0)
+        self.rate = capacity / 60 if capacity else 0.0
+        self.updated = time.monotonic()
+
+    def _refill(self, now):
+        if self.capacity:
+            self.level = min(self.capacity, self.level + (now - self.updated) * self.rate)
+        self.updated = now
+
+    # Part de la capacité encore disponible après avoir retiré amount (1.0 si la limite est inconnue)
+    def headroom(self, amount, now):
+        self._refill(now)
+        if not self.capacity:
+            return 1.0
+        return (self.level - min(amount, self.capacity)) / self.capacity
+
+    # Délai avant que amount soit disponible
+    def delay(self, amount, now):
+        self._refill(now)
+        if not self.capacity:
+            return 0.0
+        missing = min(amount, self.capacity) - self.level
+        return missing / self.rate if missing > 0 else 0.0
+
+    def take(self, amount):
+        if self.capacity:
+            self.level -= min(amount, self.capacity)
+
+    # Recaler le seau sur les en-têtes de la réponse : limite, restant et délai de remise à niveau
+    def sync(self, limit, remaining, reset, now):
+        if limit is None or remaining is None:
+            return
+        self.capacity = limit
+        self.level = float(remaining)
+        missing = limit - remaining
+        self.rate = missing / reset if reset and missing > 0 else limit / 60
+        self.updated = now
+
+
+# Une clé utilisée avec un modèle donné : les limites d'OpenAI s'appliquent par clé et par modèle
+class Route:
+    def __init__(self, key, model, rpm=None, tpm=None):
+        self.key = key
+        self.model = model
+        self.requests = TokenBucket(rpm)
+        self.tokens = TokenBucket(tpm)
+        self.cooldown_until = 0.0
+        self.disabled = None
+        self.last_used = 0.0
+
+    @property
+    def label(self):
+        return f"…{self.key[-4:]} ({self.model})"
+
+    def ready_in(self, tokens, now):
+        return max(self.cooldown_until - now, self.requests.delay(1, now), self.tokens.delay(tokens, now))
+
+    def headroom(self, tokens, now):
+        return min(self.requests.headroom(1, now), self.tokens.headroom(tokens, now))
+
+
+def _int_header(headers, name):
+    try:
+        return int(headers[name])
+    except (KeyError, TypeError, ValueError):
+        return None
+
+
+def _error_code(response):
+    try:
+        return response.json()["error"]["code"]
+    except (ValueError, KeyError, TypeError):
+        return None
+
+
+# Pool de clés API, avec des modèles de secours facultatifs. Chaque appel part sur la route (clé, modèle)
+# qui a le plus de marge sous ses limites RPM/TPM, recalées sur les en-têtes x-ratelimit-* des réponses.
+# Une route limitée (429) est mise en pause ; une clé refusée (401) ou sans crédit est écartée.
+# Le modèle demandé est préféré ; les modèles de secours ne servent que si aucune de ses routes n'est libre.
+# Un KeyPool se passe partout où une clé secrète est attendue (secret_key).
+class KeyPool:
+    def __init__(self, keys, fallback_models=(), rpm=None, tpm=None):
+        self.keys = list(dict.fromkeys(key for key in keys if key))
+        if not self.keys:
+            raise ValueError("Le pool doit contenir au moins une clé.")
+        self.fallback_models = list(fallback_models)
+        self.rpm = rpm
+        self.tpm = tpm
+        self._routes = {}
+        self._revoked_keys = {}
+        self._lock = threading.Lock()
+
+    def _route(self, key, model):
+        if (key, model) not in self._routes:
+            self._routes[(key, model)] = Route(key, model, self.rpm, self.tpm)
+        return self._routes[(key, model)]
+
+    # Tokens décomptés de la limite TPM pour une requête : prompt et max_tokens, comme le fait l'API
+    @staticmethod
+    def estimate_tokens(payload):
+        prompt = "".join(message.get("content") or "" for message in payload.get("messages", ()))
+        return count_tokens(prompt, payload.get("model")) + (payload.get("max_tokens") or 0)
+
+    # Réserver la route la plus libre pour payload, en attendant si toutes sont à leur limite
+    def acquire(self, payload):
+        tokens = self.estimate_tokens(payload)
+        models = list(dict.fromkeys([payload.get("model")] + self.fallback_models))
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                usable = []
+                for model in models:
+                    routes = [self._route(key, model) for key in self.keys]
+                    routes = [route for route in routes if route.disabled is None and route.key not in self._revoked_keys]
+                    usable += routes
+                    ready = [route for route in routes if route.ready_in(tokens, now) <= 0]
+                    if ready:
+                        route = max(ready, key=lambda route: (route.headroom(tokens, now), -route.last_used))
+                        route.requests.take(1)
+                        route.tokens.take(tokens)
+                        route.last_used = now
+                        return route
+                if not usable:
+                    raise LLMError("Aucune clé utilisable : " + "; ".join(self.disabled_routes()), 401)
+                wait = min(route.ready_in(tokens, now) for route in usable)
+            time.sleep(min(WAIT_STEP, wait))
+
+    # Prendre en compte la réponse reçue sur route. Renvoie True si l'appel doit être relancé
+    # sur une autre route sans attendre (clé refusée, modèle indisponible, limite atteinte).
+    def observe(self, route, response):
+        now = time.monotonic()
+        headers = response.headers
+        with self._lock:
+            for bucket, kind in ((route.requests, "requests"), (route.tokens, "tokens")):
+                bucket.sync(_int_header(headers, f"x-ratelimit-limit-{kind}"),
+                            _int_header(headers, f"x-ratelimit-remaining-{kind}"),
+                            parse_duration(headers.get(f"x-ratelimit-reset-{kind}")), now)
+            status = response.status_code
+            if status == 401 or (status == 429 and _error_code(response) == "insufficient_quota"):
+                self._revoked_keys[route.key] = f"clé …{route.key[-4:]} refusée (HTTP {status})"
+                return True
+            if status in (403, 404):
+                route.disabled = f"{route.label} indisponible (HTTP {status})"
+                return True
+            if status == 429:
+                delay = server_retry_delay(response)
+                route.cooldown_until = now + (delay if delay is not None else backoff_delay(0))
+                return True
+        return False
+
+    # Clés et routes écartées, avec la raison
+    def disabled_routes(self):
+        return (list(self._revoked_keys.values())
+                + [route.disabled for route in self._routes.values() if route.disabled is not None])
+
+
+# Clés secrètes saisies séparées par des virgules ou des espaces
+def split_keys(secret_keys):
+    return secret_keys.replace(",", " ").split()
+
+
+# KeyPool des clés saisies, même pour une seule clé : ses seaux RPM/TPM espacent les appels
+# au lieu de les laisser tomber sur des 429. Chaîne vide si aucune clé n'est fournie.
+def key_pool(secret_keys, fallback_models=()):
+    keys = split_keys(secret_keys) if isinstance(secret_keys, str) else list(secret_keys)
+    if not keys:
+        return ""
+    return KeyPool(keys, fallback_models)
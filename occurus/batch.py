@@ -0,0 +1,148 @@
+import json
+import time
+
+from occurus.client import CONNECT_TIMEOUT, READ_TIMEOUT, LLMError, api_base, get_session
+
+BATCH_ENDPOINT = "/v1/chat/completions"
+COMPLETION_WINDOW = "24h"
+
+# Limite de l'API Batch : nombre de requêtes par fichier
+MAX_REQUESTS_PER_BATCH = 50000
+
+POLL_INTERVAL = 30
+TERMINAL_STATUSES = {"completed", "failed", "expired", "cancelled"}
+
+
+# Une ligne du fichier JSONL de l'API Batch
+def build_batch_line(custom_id, payload):
+    return json.dumps({
+        "custom_id": str(custom_id),
+        "method": "POST",
+        "url": BATCH_ENDPOINT,
+        "body": payload
+    }, ensure_ascii=False)
+
+
+# Fichier JSONL complet pour un dictionnaire {custom_id: payload chat/completions}
+def to_jsonl(payloads):
+    return "\n".join(build_batch_line(custom_id, payload) for custom_id, payload in payloads.items()) + "\n"
+
+
+# Lire un fichier de sortie (ou d'erreurs) : ({custom_id: texte}, {custom_id: message d'erreur})
+def parse_batch_output(jsonl_text):
+    results = {}
+    errors = {}
+    for line in jsonl_text.splitlines():
+        if not line.strip():
+            continue
+        entry = json.loads(line)
+        custom_id = entry["custom_id"]
+        response = entry.get("response") or {}
+        body = response.get("body") or {}
+        if response.get("status_code") == 200 and body.get("choices"):
+            choice = body["choices"][0]
+            # Pas de nouvelle tentative possible dans un batch : une réponse coupée par max_tokens est une erreur
+            if choice.get("finish_reason") == "length":
+                errors[custom_id] = "Réponse tronquée par max_tokens"
+            else:
+                results[custom_id] = choice["message"]["content"].strip()
+        else:
+            error = entry.get("error") or body.get("error") or {}
+            errors[custom_id] = error.get("message") or f"HTTP {response.get('status_code')}"
+    return results, errors
+
+
+# Transport HTTP vers l'API Batch d'OpenAI. Tout objet exposant upload / create_batch / retrieve_batch /
+# download peut le remplacer, par exemple pour dérouler le flux contre un serveur local.
+class OpenAIBatchTransport:
+    def __init__(self, secret_key, base_url=None, session=None):
+        self.base_url = (base_url or api_base()).rstrip("/")
+        self.session = session or get_session()
+        self.headers = {"Authorization": f"Bearer {secret_key}"}
+
+    def _request(self, method, path, **kwargs):
+        response = self.session.request(method, f"{self.base_url}{path}", headers=self.headers,
+                                        timeout=(CONNECT_TIMEOUT, READ_TIMEOUT), **kwargs)
+        if not response.ok:
+            raise LLMError(f"HTTP {response.status_code} sur {path} : {response.text[:200]}", response.status_code)
+        return response
+
+    def upload(self, jsonl_text, filename="occurus_batch.jsonl"):
+        response = self._request("POST", "/files", data={"purpose": "batch"},
+                                 files={"file": (filename, jsonl_text.encode("utf-8"), "application/jsonl")})
+        return response.json()["id"]
+
+    def create_batch(self, input_file_id):
+        response = self._request("POST", "/batches", json={
+            "input_file_id": input_file_id,
+            "endpoint": BATCH_ENDPOINT,
+            "completion_window": COMPLETION_WINDOW
+        })
+        return response.json()
+
+    def retrieve_batch(self, batch_id):
+        return self._request("GET", f"/batches/{batch_id}").json()
+
+    def download(self, file_id):
+        return self._request("GET", f"/files/{file_id}/content").text
+
+
+# Soumettre des requêtes en un ou plusieurs batchs, attendre leur fin et renvoyer (résultats, erreurs)
+# indexés par custom_id. on_status(terminées, en échec, total) est appelé à chaque interrogation.
+# submissions : liste des envois déjà faits ({custom_ids, file_id, batch_id}), complétée au fil des envois ;
+# on_submit() est appelé après chaque fichier déposé ou batch créé pour l'enregistrer. En repassant la liste
+# enregistrée, l'interrogation reprend sur les batchs existants sans renvoyer (ni repayer) leurs requêtes.
+def run_batch(payloads, transport, poll_interval=POLL_INTERVAL, timeout=None, on_status=None, submissions=None,
+              on_submit=None):
+    payloads = {str(custom_id): payload for custom_id, payload in payloads.items()}
+    custom_ids = list(payloads)
+    submissions = submissions if submissions is not None else []
+    on_submit = on_submit or (lambda: None)
+    submitted = {custom_id for submission in submissions for custom_id in submission["custom_ids"]}
+    pending = [custom_id for custom_id in custom_ids if custom_id not in submitted]
+    for start in range(0, len(pending), MAX_REQUESTS_PER_BATCH):
+        chunk_ids = pending[start:start + MAX_REQUESTS_PER_BATCH]
+        file_id = transport.upload(to_jsonl({custom_id: payloads[custom_id] for custom_id in chunk_ids}))
+        submissions.append({"custom_ids": chunk_ids, "file_id": file_id, "batch_id": None})
+        on_submit()
+
+    batch_requests = {}
+    batches = {}
+    for submission in submissions:
+        if submission["batch_id"] is None:
+            batch = transport.create_batch(submission["file_id"])
+            submission["batch_id"] = batch["id"]
+            batches[batch["id"]] = batch
+            on_submit()
+        batch_requests[submission["batch_id"]] = submission["custom_ids"]
+
+    deadline = time.monotonic() + timeout if timeout else None
+    while True:
+        # Les batchs repris d'un envoi précédent sont relus dès le premier tour
+        for batch_id in batch_requests:
+            if batch_id not in batches or batches[batch_id]["status"] not in TERMINAL_STATUSES:
+                batches[batch_id] = transport.retrieve_batch(batch_id)
+        if on_status is not None:
+            request_counts = [batch.get("request_counts") or {} for batch in batches.values()]
+            on_status(sum(counts.get("completed", 0) for counts in request_counts),
+                      sum(counts.get("failed", 0) for counts in request_counts),
+                      len(custom_ids))
+        if all(batch["status"] in TERMINAL_STATUSES for batch in batches.values()):
+            break
+        if deadline is not None and time.monotonic() > deadline:
+            raise LLMError("Délai d'attente dépassé pour le batch")
+        time.sleep(poll_interval)
+
+    results = {}
+    errors = {}
+    for batch_id, batch in batches.items():
+        # Un batch expiré ou annulé peut tout de même contenir des résultats partiels
+        for file_key in ("output_file_id", "error_file_id"):
+            if batch.get(file_key):
+                batch_results, batch_errors = parse_batch_output(transport.download(batch[file_key]))
+                results.update(batch_results)
+                errors.update(batch_errors)
+        for custom_id in batch_requests[batch_id]:
+            if custom_id not in results and custom_id not in errors:
+                errors[custom_id] = f"Batch {batch_id} : {batch['status']}"
+    return results, errors
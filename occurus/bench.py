@@ -0,0 +1,166 @@
+import csv
+import json
+import os
+import random
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+
+from occurus.cache import ResponseCache
+from occurus.jobs import JobJournal
+from occurus.metrics import MetricsRecorder, recording
+from occurus.pipeline import NUMERIC_RESULT_COLUMNS, RESULT_COLUMNS, REVIEW_SYSTEMATIC, iter_jobs, preflight, run_rows_concurrently
+from occurus.sheets import export_results
+
+# Tailles de tableur mesurées par défaut
+BENCH_SIZES = (10, 1000, 10000)
+
+# Latence par défaut du serveur simulé : assez courte pour mesurer le pipeline plutôt que l'attente réseau
+BENCH_LATENCY = "uniform:0.01,0.05"
+
+VOCABULARY = ("chaussure", "randonnée", "cuir", "semelle", "confort", "montagne", "imperméable", "taille",
+              "entretien", "marche", "légère", "robuste", "hiver", "été", "sentier", "cheville")
+
+
+# Tableur synthétique de rows lignes (csv) : mots-clés et occurrences tirés au hasard,
+# texte source vide pour une ligne sur deux, et une part duplicate_rate de copies de lignes précédentes
+def synthetic_sheet(path, rows, seed=0, duplicate_rate=0.0):
+    rng = random.Random(seed)
+    written = []
+    with open(path, "w", encoding="utf-8", newline="") as output:
+        writer = csv.writer(output)
+        writer.writerow(["keyword", "Text or not", "Occurrences"])
+        for index in range(rows):
+            if written and rng.random() < duplicate_rate:
+                values = rng.choice(written)
+            else:
+                words = rng.sample(VOCABULARY, 4)
+                occurrences = {word: rng.randint(1, 3) for word in words[1:]}
+                source_text = "" if index % 2 else " ".join(rng.choices(VOCABULARY, k=60))
+                values = [f"{words[0]} {index}", source_text, json.dumps(occurrences, ensure_ascii=False)]
+                written.append(values)
+            writer.writerow(values)
+    return path
+
+
+# Mémoire résidente du processus (Linux), sinon le pic depuis son démarrage (getrusage)
+def _resident_memory():
+    try:
+        with open("/proc/self/statm") as statm:
+            return int(statm.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError, AttributeError):
+        pass
+    try:
+        import resource
+    except ImportError:
+        return 0
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak if sys.platform == "darwin" else peak * 1024
+
+
+# Pic de mémoire résidente pendant une mesure, relevé toutes les interval secondes par un thread.
+# (tracemalloc serait plus précis mais ralentit le pipeline d'un facteur 2 à 3, faussant le débit.)
+class PeakMemory:
+    def __init__(self, interval=0.05):
+        self.interval = interval
+        self.peak = 0
+        self._stop = threading.Event()
+
+    def _sample(self):
+        while True:
+            self.peak = max(self.peak, _resident_memory())
+            if self._stop.wait(self.interval):
+                return
+
+    def __enter__(self):
+        self.peak = _resident_memory()
+        self._thread = threading.Thread(target=self._sample, daemon=True)
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc_info):
+        self._stop.set()
+        self._thread.join()
+
+
+# Lancer le serveur simulé dans un processus séparé, pour qu'il ne partage ni le GIL ni la mémoire mesurée
+def spawn_mock_server(latency=BENCH_LATENCY, error_429_rate=0.0, error_5xx_rate=0.0, rpm=None, tpm=None, seed=None,
+                      revoked_keys=()):
+    command = [sys.executable, "-m", "occurus", "mock-server", "--port", "0", "--latency", latency,
+               "--error-429", str(error_429_rate), "--error-5xx", str(error_5xx_rate)]
+    for option, value in (("--rpm", rpm), ("--tpm", tpm), ("--seed", seed)):
+        if value is not None:
+            command += [option, str(value)]
+    for key in revoked_keys:
+        command += ["--revoked-key", key]
+    process = subprocess.Popen(command, stdout=subprocess.PIPE, text=True)
+    base_url = process.stdout.readline().strip()
+    if not base_url:
+        process.kill()
+        raise RuntimeError("Le serveur simulé n'a pas démarré.")
+    return process, base_url
+
+
+# Mesurer le pipeline complet (pré-validation, génération → révision → score, journal, export) sur un tableur
+# synthétique. Le pic mémoire est la mémoire résidente maximale du processus pendant la mesure.
+# secret_key peut être un KeyPool, pour mesurer la répartition entre plusieurs clés.
+def run_benchmark(rows, workers=16, base_url=None, use_cache=False, review_mode=REVIEW_SYSTEMATIC,
+                  secret_key="bench", duplicate_rate=0.0, **mock_options):
+    # Les modules chargés au premier appel ne sont pas comptés dans la mesure
+    import pandas
+
+    process = None
+    if base_url is None:
+        process, base_url = spawn_mock_server(**mock_options)
+    try:
+        with tempfile.TemporaryDirectory() as directory:
+            source = synthetic_sheet(os.path.join(directory, "bench.csv"), rows, duplicate_rate=duplicate_rate)
+            journal = JobJournal("bench", directory)
+            cache = ResponseCache(os.path.join(directory, "cache.sqlite")) if use_cache else None
+            metrics = MetricsRecorder(rows)
+            failed_rows = 0
+
+            started = time.perf_counter()
+            with PeakMemory() as memory, recording(metrics):
+                report = preflight(source, "csv")
+                jobs = iter_jobs(source, "csv", only_rows=report.job_rows)
+                for _, result in run_rows_concurrently(jobs, secret_key, 0.7, workers, cache, journal,
+                                                       report.duplicates, review_mode=review_mode, base_url=base_url):
+                    failed_rows += result['Statut'] != "OK"
+                    metrics.record_row()
+                offsets, _ = journal.scan()
+                export_results(source, "csv", os.path.join(directory, "bench_out.csv"), "csv", RESULT_COLUMNS,
+                               lambda index: journal.read(offsets[index]) if index in offsets else None,
+                               numeric_columns=NUMERIC_RESULT_COLUMNS)
+            elapsed = time.perf_counter() - started
+            journal.close()
+    finally:
+        if process is not None:
+            process.terminate()
+            process.wait()
+
+    snapshot = metrics.snapshot()
+    return {
+        "rows": rows,
+        "workers": workers,
+        "seconds": round(elapsed, 3),
+        "rows_per_second": round(rows / elapsed, 2),
+        "peak_memory_mb": round(memory.peak / 2 ** 20, 1),
+        "api_calls_per_row": round(snapshot["calls"] / rows, 2) if rows else 0.0,
+        "latency_p50_seconds": snapshot["latency_p50_seconds"],
+        "latency_p95_seconds": snapshot["latency_p95_seconds"],
+        "retries": snapshot["retries"],
+        "failed_rows": failed_rows,
+    }
+
+
+# Tableau texte des résultats
+def format_results(results):
+    header = ("lignes", "s", "lignes/s", "mémoire (Mo)", "appels/ligne", "p50 (s)", "p95 (s)", "reprises", "échecs")
+    keys = ("rows", "seconds", "rows_per_second", "peak_memory_mb", "api_calls_per_row",
+            "latency_p50_seconds", "latency_p95_seconds", "retries", "failed_rows")
+    lines = [header] + [tuple(str(result[key]) for key in keys) for result in results]
+    widths = [max(len(line[column]) for line in lines) for column in range(len(header))]
+    return "\n".join("  ".join(value.rjust(width) for value, width in zip(line, widths)) for line in lines)
@@ -0,0 +1,231 @@
+import argparse
+import json
+import os
+import sys
+
+OUTPUT_EXTENSIONS = {".csv": "csv", ".parquet": "parquet"}
+
+
+# Format de sortie d'après l'extension du fichier (xlsx par défaut)
+def output_format_for(path):
+    return OUTPUT_EXTENSIONS.get(os.path.splitext(path)[1].lower(), "xlsx")
+
+
+def build_parser():
+    parser = argparse.ArgumentParser(
+        prog="occurus",
+        description="Création de textes SEO avec Occurus Rewrite, sans navigateur."
+    )
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    run = commands.add_parser("run", help="Générer et réviser les textes d'un tableur (xlsx ou csv)")
+    run.add_argument("input", help="Tableur avec les colonnes 'keyword', 'Text or not' et 'Occurrences'")
+    run.add_argument("-o", "--output", required=True, help="Fichier de sortie (.xlsx, .csv ou .parquet)")
+    run.add_argument("--api-key", default=os.environ.get("OPENAI_API_KEY"),
+                     help="Clé(s) secrète(s) OpenAI séparées par des virgules (par défaut : variable OPENAI_API_KEY)")
+    run.add_argument("--fallback-model", action="append", default=[],
+                     help="Modèle de secours quand toutes les clés sont limitées sur le modèle principal (répétable)")
+    run.add_argument("--base-url", default=None,
+                     help="URL de base d'une API compatible OpenAI (par défaut : OCCURUS_API_BASE ou api.openai.com)")
+    run.add_argument("--temperature", type=float, default=0.7)
+    run.add_argument("--workers", type=int, default=8, help="Nombre de requêtes simultanées")
+    run.add_argument("--review", choices=("systematic", "adaptive"), default="systematic", help="Mode de révision")
+    run.add_argument("--threshold", type=float, default=100.0,
+                     help="Score d'occurrences suffisant en révision adaptative (%%)")
+    run.add_argument("--max-corrections", type=int, default=2,
+                     help="Nombre maximal de corrections ciblées en révision adaptative")
+    run.add_argument("--no-cache", action="store_true", help="Ignorer le cache des réponses")
+    run.add_argument("--cache-path", default=None, help="Fichier SQLite du cache des réponses")
+    run.add_argument("--batch", action="store_true", help="Passer par l'API Batch (hors ligne)")
+    run.add_argument("--poll-interval", type=float, default=None, help="Intervalle d'interrogation des batchs (s)")
+    run.add_argument("--long-source", choices=("truncate", "reject"), default="truncate",
+                     help="Textes sources trop longs : les tronquer ou ignorer la ligne")
+    run.add_argument("--max-source-tokens", type=int, default=None, help="Taille maximale du texte source (tokens)")
+    run.add_argument("--journal-dir", default=None, help="Dossier des journaux de reprise")
+    run.add_argument("--restart", action="store_true", help="Ignorer le journal et repartir de zéro")
+    run.add_argument("--strict", action="store_true",
+                     help="Ne lancer aucun appel si la pré-validation trouve des lignes invalides")
+    run.add_argument("--metrics-json", default=None, help="Écrire les métriques du traitement dans ce fichier JSON")
+    run.add_argument("--metrics-prom", default=None,
+                     help="Écrire les métriques au format texte Prometheus dans ce fichier")
+
+    rescore = commands.add_parser("rescore", help="Recalculer les scores d'occurrences d'un tableur déjà généré")
+    rescore.add_argument("input")
+    rescore.add_argument("-o", "--output", required=True)
+    rescore.add_argument("--text-column", default="Texte Révisé")
+
+    mock = commands.add_parser("mock-server", help="Servir une API chat/completions simulée, pour les mesures")
+    mock.add_argument("--host", default="127.0.0.1")
+    mock.add_argument("--port", type=int, default=8000, help="Port d'écoute (0 : port libre)")
+    _add_mock_options(mock, "lognormal:0.3,0.5")
+
+    bench = commands.add_parser("bench", help="Mesurer le débit du pipeline sur des tableurs synthétiques")
+    bench.add_argument("--rows", type=int, nargs="+", default=None, help="Tailles de tableur (par défaut : 10 1000 10000)")
+    bench.add_argument("--workers", type=int, default=16, help="Nombre de requêtes simultanées")
+    bench.add_argument("--review", choices=("systematic", "adaptive"), default="systematic", help="Mode de révision")
+    bench.add_argument("--cache", action="store_true", help="Utiliser un cache des réponses (vide au départ)")
+    bench.add_argument("--base-url", default=None,
+                       help="API à mesurer (par défaut : un serveur simulé lancé pour l'occasion)")
+    bench.add_argument("--duplicates", type=float, default=0.0, help="Part de lignes en double dans les tableurs")
+    bench.add_argument("--keys", type=int, default=1, help="Nombre de clés simulées réparties par le pool")
+    bench.add_argument("--json", default=None, help="Écrire les résultats dans ce fichier JSON")
+    _add_mock_options(bench, None)
+
+    return parser
+
+
+def _add_mock_options(parser, default_latency):
+    parser.add_argument("--latency", default=default_latency,
+                        help="Latence simulée : fixed:S, uniform:A,B, normal:M,E, lognormal:MÉDIANE,SIGMA ou exponential:M")
+    parser.add_argument("--error-429", type=float, default=0.0, help="Part des requêtes refusées en 429")
+    parser.add_argument("--error-5xx", type=float, default=0.0, help="Part des requêtes en erreur 5xx")
+    parser.add_argument("--rpm", type=int, default=None, help="Limite de requêtes par minute et par clé")
+    parser.add_argument("--tpm", type=int, default=None, help="Limite de tokens par minute et par clé")
+    parser.add_argument("--seed", type=int, default=None, help="Graine des tirages aléatoires")
+    parser.add_argument("--revoked-key", action="append", default=[], help="Clé refusée en 401 (répétable)")
+
+
+def _progress(done, total, metrics):
+    eta = metrics["eta_seconds"]
+    sys.stderr.write(f"\r{done}/{total} lignes, {metrics['rows_per_minute']:.1f} lignes/min, "
+                     f"p95 {metrics['latency_p95_seconds']:.1f} s"
+                     + (f", reste {eta:.0f} s" if eta is not None else "") + "   ")
+    sys.stderr.flush()
+
+
+def run(args):
+    from occurus.balancer import key_pool, split_keys
+    from occurus.batch import POLL_INTERVAL, OpenAIBatchTransport
+    from occurus.cache import DEFAULT_PATH, ResponseCache
+    from occurus.jobs import JOBS_DIR, JobJournal, job_id_for_path
+    from occurus.metrics import MetricsRecorder, recording
+    from occurus.pipeline import NUMERIC_RESULT_COLUMNS, RESULT_COLUMNS, iter_jobs, preflight, run_rows_concurrently, run_rows_in_batches
+    from occurus.sheets import export_results, read_header, sheet_format
+    from occurus.tokens import MAX_SOURCE_TOKENS
+
+    if not split_keys(args.api_key or ""):
+        print("Erreur : clé OpenAI manquante (--api-key ou OPENAI_API_KEY).", file=sys.stderr)
+        return 2
+    source_format = sheet_format(args.input)
+    columns = read_header(args.input, source_format)
+    if not {'keyword', 'Text or not', 'Occurrences'} <= set(columns):
+        print("Erreur : le fichier doit contenir les colonnes 'keyword', 'Text or not', et 'Occurrences'.", file=sys.stderr)
+        return 2
+
+    journal = JobJournal(job_id_for_path(args.input), args.journal_dir or JOBS_DIR)
+    if args.restart:
+        journal.clear()
+    _, finished_rows = journal.scan()
+
+    # Pré-validation de toutes les lignes restantes et regroupement des doublons, avant le moindre appel
+    max_source_tokens = args.max_source_tokens or MAX_SOURCE_TOKENS
+    settings = (args.temperature, args.review, args.threshold, args.max_corrections, args.batch)
+    report = preflight(args.input, source_format, finished_rows, args.long_source, max_source_tokens, settings)
+    total_rows = report.rows + len(finished_rows)
+    for _, message in report.errors:
+        print(message, file=sys.stderr)
+    print(report.summary(1 if args.review == "adaptive" and not args.batch else 2), file=sys.stderr)
+    if args.strict and report.errors:
+        print("Aucun appel lancé (--strict) : corriger les lignes en erreur puis relancer.", file=sys.stderr)
+        journal.close()
+        return 2
+
+    jobs = iter_jobs(args.input, source_format, finished_rows, source_policy=args.long_source,
+                     max_source_tokens=max_source_tokens, only_rows=report.job_rows)
+    secret_key = key_pool(args.api_key, args.fallback_model)
+    if args.batch:
+        # L'API Batch a ses propres files d'attente : la première clé suffit
+        transport = OpenAIBatchTransport(split_keys(args.api_key)[0], args.base_url)
+        row_results = run_rows_in_batches(list(jobs), args.temperature, transport, journal,
+                                          poll_interval=args.poll_interval or POLL_INTERVAL, duplicates=report.duplicates)
+    else:
+        cache = None if args.no_cache else ResponseCache(args.cache_path or DEFAULT_PATH)
+        row_results = run_rows_concurrently(jobs, secret_key, args.temperature, args.workers, cache, journal,
+                                            duplicates=report.duplicates,
+                                            review_mode=args.review, score_threshold=args.threshold,
+                                            max_corrections=args.max_corrections, base_url=args.base_url)
+
+    completed_rows = len(finished_rows)
+    failed_rows = 0
+    metrics = MetricsRecorder(report.rows - len(report.errors))
+    with recording(metrics):
+        for _, result in row_results:
+            completed_rows += 1
+            failed_rows += result['Statut'] != "OK"
+            metrics.record_row()
+            _progress(completed_rows, total_rows, metrics.snapshot())
+    sys.stderr.write("\n")
+    if args.metrics_json:
+        with open(args.metrics_json, "w", encoding="utf-8") as output:
+            output.write(metrics.to_json())
+    if args.metrics_prom:
+        with open(args.metrics_prom, "w", encoding="utf-8") as output:
+            output.write(metrics.to_prometheus())
+    if not args.batch:
+        print(metrics.usage_summary(), file=sys.stderr)
+
+    offsets, _ = journal.scan()
+    export_results(args.input, source_format, args.output, output_format_for(args.output), RESULT_COLUMNS,
+                   lambda index: journal.read(offsets[index]) if index in offsets else None,
+                   numeric_columns=NUMERIC_RESULT_COLUMNS)
+    journal.close()
+    if failed_rows:
+        print(f"{failed_rows} ligne(s) en échec, relancer la même commande pour les reprendre.", file=sys.stderr)
+        return 1
+    return 0
+
+
+def rescore(args):
+    from occurus.scoring import rescore_column
+    from occurus.sheets import SheetWriter, iter_sheet_chunks, read_header, sheet_format
+
+    source_format = sheet_format(args.input)
+    columns = read_header(args.input, source_format)
+    if args.text_column not in columns or 'Occurrences' not in columns:
+        print(f"Erreur : le fichier doit contenir les colonnes '{args.text_column}' et 'Occurrences'.", file=sys.stderr)
+        return 2
+    columns += [column for column in ('Score Occurrences (%)', 'Détail Occurrences') if column not in columns]
+    with SheetWriter(args.output, columns, output_format_for(args.output), ['Score Occurrences (%)']) as writer:
+        for chunk in iter_sheet_chunks(args.input, source_format):
+            chunk['Score Occurrences (%)'], chunk['Détail Occurrences'] = rescore_column(chunk, args.text_column)
+            writer.write_chunk(chunk)
+    return 0
+
+
+def mock_server(args):
+    from occurus.mockserver import MockChatServer
+
+    server = MockChatServer((args.host, args.port), args.latency, args.error_429, args.error_5xx,
+                            args.rpm, args.tpm, seed=args.seed, revoked_keys=args.revoked_key)
+    # Première ligne de la sortie : l'URL de base, lue par occurus bench
+    print(server.base_url, flush=True)
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    return 0
+
+
+def bench(args):
+    from occurus.balancer import key_pool
+    from occurus.bench import BENCH_LATENCY, BENCH_SIZES, format_results, run_benchmark
+
+    results = []
+    for rows in args.rows or BENCH_SIZES:
+        # Un pool neuf par mesure, pour ne pas hériter des limites observées lors de la précédente
+        secret_key = key_pool([f"bench-{number}" for number in range(args.keys)])
+        results.append(run_benchmark(rows, args.workers, args.base_url, args.cache, args.review, secret_key, args.duplicates,
+                                     latency=args.latency or BENCH_LATENCY, error_429_rate=args.error_429,
+                                     error_5xx_rate=args.error_5xx, rpm=args.rpm, tpm=args.tpm, seed=args.seed,
+                                     revoked_keys=args.revoked_key))
+        print(f"{rows} lignes mesurées", file=sys.stderr)
+    print(format_results(results))
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as output:
+            json.dump(results, output, indent=2)
+    return 0
+
+
+def main(argv=None):
+    args = build_parser().parse_args(argv)
+    return {"run": run, "rescore": rescore, "mock-server": mock_server, "bench": bench}[args.command](args)
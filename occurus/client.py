@@ -0,0 +1,219 @@
+import os
+import random
+import re
+import threading
+import time
+from email.utils import parsedate_to_datetime
+
+import requests
+from requests.adapters import HTTPAdapter
+
+# URL de base de l'API, compatible OpenAI, pour viser un proxy ou le serveur simulé de occurus.mockserver.
+# OCCURUS_API_BASE (ou set_api_base) ne fixe que la valeur par défaut du processus : quand plusieurs sessions
+# le partagent (Streamlit), chacune passe sa propre base_url aux appels pour ne pas envoyer ses clés ailleurs.
+DEFAULT_API_BASE = "https://api.openai.com/v1"
+CHAT_COMPLETIONS_PATH = "/chat/completions"
+
+# Délais réseau : (connexion, lecture) en secondes
+CONNECT_TIMEOUT = 10
+READ_TIMEOUT = 120
+
+# Politique de nouvelle tentative
+MAX_RETRIES = 5
+BACKOFF_BASE = 1.0
+BACKOFF_MAX = 60.0
+RETRY_AFTER_MAX = 300.0
+RETRY_STATUSES = {408, 409, 429, 500, 502, 503, 504}
+
+# Erreurs réseau passagères, relancées ; les autres erreurs de requests (URL invalide...) échouent tout de suite
+TRANSIENT_ERRORS = (requests.ConnectionError, requests.Timeout, requests.exceptions.ChunkedEncodingError,
+                    requests.exceptions.ContentDecodingError)
+
+# Taille du pool de connexions keep-alive partagé entre les threads
+POOL_SIZE = 32
+
+_api_base = os.environ.get("OCCURUS_API_BASE") or DEFAULT_API_BASE
+
+_session = None
+_session_lock = threading.Lock()
+
+_DURATION_PART = re.compile(r"(\d+(?:\.\d+)?)(ms|h|m|s)")
+_DURATION_UNITS = {"h": 3600.0, "m": 60.0, "s": 1.0, "ms": 0.001}
+
+
+# Erreur levée quand un appel échoue définitivement (après les nouvelles tentatives)
+class LLMError(Exception):
+    def __init__(self, message, status=None):
+        super().__init__(message)
+        self.status = status
+
+
+def api_base():
+    return _api_base.rstrip("/")
+
+
+def set_api_base(base_url):
+    global _api_base
+    _api_base = base_url or DEFAULT_API_BASE
+
+
+# URL chat/completions d'une API (par défaut celle du processus)
+def chat_completions_url(base_url=None):
+    return (base_url or api_base()).rstrip("/") + CHAT_COMPLETIONS_PATH
+
+
+# Session HTTP partagée : réutilise les connexions TLS au lieu d'une poignée de main par requête
+def get_session():
+    global _session
+    with _session_lock:
+        if _session is None:
+            session = requests.Session()
+            adapter = HTTPAdapter(pool_connections=4, pool_maxsize=POOL_SIZE)
+            session.mount("https://", adapter)
+            session.mount("http://", adapter)
+            _session = session
+    return _session
+
+
+# Convertir une durée OpenAI ("20ms", "1s", "6m0s", "1h2m3.5s") en secondes
+def parse_duration(value):
+    if not value:
+        return None
+    try:
+        return float(value)
+    except ValueError:
+        pass
+    parts = _DURATION_PART.findall(value)
+    if not parts:
+        return None
+    return sum(float(amount) * _DURATION_UNITS[unit] for amount, unit in parts)
+
+
+# Délai imposé par le serveur via Retry-After ou les en-têtes x-ratelimit-*
+def server_retry_delay(response):
+    headers = response.headers
+    if headers.get("retry-after-ms"):
+        try:
+            return float(headers["retry-after-ms"]) / 1000
+        except ValueError:
+            pass
+    retry_after = headers.get("retry-after")
+    if retry_after:
+        try:
+            return max(0.0, float(retry_after))
+        except ValueError:
+            try:
+                return max(0.0, parsedate_to_datetime(retry_after).timestamp() - time.time())
+            except (TypeError, ValueError):
+                pass
+    if response.status_code == 429:
+        delays = []
+        for kind in ("requests", "tokens"):
+            if headers.get(f"x-ratelimit-remaining-{kind}") == "0":
+                delays.append(parse_duration(headers.get(f"x-ratelimit-reset-{kind}")))
+        delays = [delay for delay in delays if delay is not None]
+        if delays:
+            return max(delays)
+    return None
+
+
+# Backoff exponentiel avec gigue complète
+def backoff_delay(attempt):
+    return random.uniform(0, min(BACKOFF_MAX, BACKOFF_BASE * 2 ** attempt))
+
+
+# Extraire un message lisible d'une réponse d'erreur de l'API
+def _error_message(response):
+    try:
+        return response.json()["error"]["message"]
+    except (ValueError, KeyError, TypeError):
+        return response.text[:200] or response.reason
+
+
+# Fonctions appelées après chaque appel LLM (réussi ou définitivement en échec) avec un dict décrivant l'appel :
+# model, attempts, status, latency (s), usage (champ usage de la réponse) et error
+_call_hooks = []
+
+
+def add_call_hook(hook):
+    _call_hooks.append(hook)
+
+
+def remove_call_hook(hook):
+    if hook in _call_hooks:
+        _call_hooks.remove(hook)
+
+
+# pool : KeyPool facultatif qui choisit la clé et le modèle de chaque tentative (occurus.balancer)
+def _post_with_retries(session, url, headers, payload, timeout, max_retries, call, pool=None):
+    for attempt in range(max_retries + 1):
+        last_attempt = attempt == max_retries
+        call["attempts"] = attempt + 1
+        request_headers, request_payload = headers, payload
+        if pool is not None:
+            route = pool.acquire(payload)
+            request_headers = {**headers, "Authorization": f"Bearer {route.key}"}
+            request_payload = {**payload, "model": route.model}
+            call["model"] = route.model
+        try:
+            response = session.post(url, headers=request_headers, json=request_payload, timeout=timeout)
+        except requests.RequestException as error:
+            call["status"] = None
+            if not isinstance(error, TRANSIENT_ERRORS):
+                raise LLMError(f"Requête impossible : {error}") from error
+            if last_attempt:
+                raise LLMError(f"Erreur réseau : {error}") from error
+            time.sleep(backoff_delay(attempt))
+            continue
+
+        call["status"] = response.status_code
+        if response.status_code == 200:
+            if pool is not None:
+                pool.observe(route, response)
+            try:
+                response_json = response.json()
+                response_json["choices"][0]["message"]["content"]
+            except (ValueError, KeyError, IndexError, TypeError) as error:
+                raise LLMError("Réponse de l'API invalide", response.status_code) from error
+            return response_json
+
+        # Le pool écarte ou met en pause la route fautive : la tentative suivante part ailleurs sans attendre
+        if pool is not None and pool.observe(route, response) and not last_attempt:
+            continue
+
+        if response.status_code not in RETRY_STATUSES or last_attempt:
+            raise LLMError(f"HTTP {response.status_code} : {_error_message(response)}", response.status_code)
+
+        delay = server_retry_delay(response)
+        if delay is None:
+            delay = backoff_delay(attempt)
+        else:
+            # Un peu de gigue pour ne pas relancer tous les threads au même instant
+            delay = min(RETRY_AFTER_MAX, delay) + random.uniform(0, BACKOFF_BASE)
+        time.sleep(delay)
+
+
+# Envoyer une requête chat/completions avec délais, nouvelles tentatives et respect des limites de débit.
+# secret_key est une clé, ou un KeyPool qui répartit les appels entre plusieurs clés et modèles.
+# call, facultatif, est complété avec le détail de l'appel transmis aux hooks, dont le modèle qui a répondu.
+def chat_completion(payload, secret_key, url=None, max_retries=MAX_RETRIES,
+                    timeout=(CONNECT_TIMEOUT, READ_TIMEOUT), call=None):
+    url = url or chat_completions_url()
+    pool = None if isinstance(secret_key, str) else secret_key
+    headers = {"Content-Type": "application/json"}
+    if pool is None:
+        headers["Authorization"] = f"Bearer {secret_key}"
+    call = call if call is not None else {}
+    call.update({"model": payload.get("model"), "attempts": 0, "status": None, "usage": None, "error": None})
+    started = time.perf_counter()
+    try:
+        response_json = _post_with_retries(get_session(), url, headers, payload, timeout, max_retries, call, pool)
+        call["usage"] = response_json.get("usage")
+        return response_json
+    except LLMError as error:
+        call["error"] = str(error)
+        raise
+    finally:
+        call["latency"] = time.perf_counter() - started
+        for hook in list(_call_hooks):
+            hook(call)
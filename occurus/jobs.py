@@ -0,0 +1,121 @@
+import hashlib
+import json
+import os
+import threading
+
+JOBS_DIR = ".occurus_jobs"
+
+
+# Identifiant stable d'un traitement : empreinte du fichier importé
+def job_id_for(file_bytes):
+    return hashlib.sha256(file_bytes).hexdigest()[:16]
+
+
+# Journal d'un traitement : une ligne JSON par ligne du tableur terminée.
+# Permet de reprendre après un crash ou une réexécution Streamlit sans repayer les lignes déjà générées.
+class JobJournal:
+    def __init__(self, job_id, directory=JOBS_DIR):
+        os.makedirs(directory, exist_ok=True)
+        self.job_id = job_id
+        self.path = os.path.join(directory, f"{job_id}.jsonl")
+        self.batch_path = os.path.join(directory, f"{job_id}.batch.json")
+        self._lock = threading.Lock()
+        self._reader = None
+
+    # Parcourir le journal sans garder les textes en mémoire : renvoie ({index: position de sa dernière entrée},
+    # ensemble des lignes terminées avec succès). La dernière entrée d'une ligne l'emporte.
+    def scan(self):
+        offsets = {}
+        finished = set()
+        if not os.path.exists(self.path):
+            return offsets, finished
+        with open(self.path, "rb") as journal_file:
+            offset = journal_file.tell()
+            for line in iter(journal_file.readline, b""):
+                try:
+                    entry = json.loads(line)
+                except json.JSONDecodeError:
+                    # Dernière ligne tronquée par un arrêt brutal
+                    offset += len(line)
+                    continue
+                index = entry["index"]
+                offsets[index] = offset
+                if entry["result"].get("Statut") == "OK":
+                    finished.add(index)
+                else:
+                    finished.discard(index)
+                offset += len(line)
+        return offsets, finished
+
+    # Relire le résultat enregistré à une position donnée par scan()
+    def read(self, offset):
+        with self._lock:
+            if self._reader is None:
+                self._reader = open(self.path, "rb")
+            self._reader.seek(offset)
+            line = self._reader.readline()
+        return json.loads(line)["result"]
+
+    # Taille du journal, qui change à chaque ligne enregistrée
+    def size(self):
+        return os.path.getsize(self.path) if os.path.exists(self.path) else 0
+
+    # Ajouter une ligne terminée et la forcer sur disque.
+    # Après un arrêt brutal, la ligne tronquée est d'abord terminée pour ne pas y coller la nouvelle entrée.
+    def record(self, index, result):
+        line = (json.dumps({"index": int(index), "result": result}, ensure_ascii=False) + "\n").encode("utf-8")
+        with self._lock:
+            with open(self.path, "a+b") as journal_file:
+                if journal_file.seek(0, os.SEEK_END) > 0:
+                    journal_file.seek(-1, os.SEEK_END)
+                    if journal_file.read(1) != b"\n":
+                        line = b"\n" + line
+                journal_file.write(line)
+                journal_file.flush()
+                os.fsync(journal_file.fileno())
+
+    # État des envois à l'API Batch pas encore rapatriés (étape, fichiers et batchs), ou None.
+    # Les batchs tournent jusqu'à 24 h : une réexécution ou un crash reprend leur interrogation au lieu de les repayer.
+    def batch_state(self):
+        try:
+            with open(self.batch_path, encoding="utf-8") as state_file:
+                return json.load(state_file)
+        except (FileNotFoundError, json.JSONDecodeError):
+            return None
+
+    # Remplacer l'état des batchs d'un seul coup, pour qu'un arrêt brutal ne laisse pas un fichier à moitié écrit
+    def save_batch_state(self, state):
+        temporary_path = self.batch_path + ".tmp"
+        with self._lock:
+            with open(temporary_path, "w", encoding="utf-8") as state_file:
+                json.dump(state, state_file, ensure_ascii=False)
+                state_file.flush()
+                os.fsync(state_file.fileno())
+            os.replace(temporary_path, self.batch_path)
+
+    def clear_batch_state(self):
+        with self._lock:
+            if os.path.exists(self.batch_path):
+                os.remove(self.batch_path)
+
+    def close(self):
+        with self._lock:
+            if self._reader is not None:
+                self._reader.close()
+                self._reader = None
+
+    def clear(self):
+        self.close()
+        with self._lock:
+            if os.path.exists(self.path):
+                os.remove(self.path)
+        self.clear_batch_state()
+
+
+# Même identifiant que job_id_for, calculé en lisant le fichier par morceaux
+def job_id_for_path(path):
+    digest = hashlib.sha256()
+    with open(path, "rb") as source_file:
+        for block in iter(lambda: source_file.read(1 << 20), b""):
+            digest.update(block)
+    return digest.hexdigest()[:16]
@@ -0,0 +1,66 @@
+from occurus.client import LLMError, chat_completion, chat_completions_url
+from occurus.prompts import correction_messages, generation_messages, review_messages
+from occurus.tokens import MAX_COMPLETION_TOKENS, max_tokens_for_text, max_tokens_for_words
+
+# Corps d'une requête chat/completions, partagé par les appels directs et les fichiers batch
+def build_payload(prompt, systeme, temperature=0.7, model="gpt-4o-mini", max_tokens=1200):
+    return {
+        "model": model,
+        "messages": [
+            {"role": "system", "content": systeme},
+            {"role": "user", "content": prompt}
+        ],
+        "temperature": temperature,
+        "max_tokens": max_tokens
+    }
+
+def _truncated(response_json):
+    return response_json['choices'][0].get('finish_reason') == "length"
+
+# Définir la fonction GPT35
+def GPT35(prompt, systeme, secret_key, temperature=0.7, model="gpt-4o-mini", max_tokens=1200, cache=None, base_url=None):
+    url = chat_completions_url(base_url)
+    # Réponse déjà obtenue pour exactement la même requête, auprès de la même API
+    if cache is not None:
+        cache_key = cache.make_key(url, model, systeme, prompt, temperature, max_tokens)
+        cached_response = cache.get(cache_key)
+        if cached_response is not None:
+            return cached_response
+
+    call = {}
+    response_json = chat_completion(build_payload(prompt, systeme, temperature, model, max_tokens), secret_key, url,
+                                    call=call)
+    # Réponse coupée par max_tokens : une seule nouvelle tentative avec un budget doublé (plafonné),
+    # puis échec plutôt qu'un texte tronqué marqué « OK » et mis en cache
+    if _truncated(response_json) and max_tokens < MAX_COMPLETION_TOKENS:
+        retry_max_tokens = min(MAX_COMPLETION_TOKENS, 2 * max_tokens)
+        response_json = chat_completion(build_payload(prompt, systeme, temperature, model, retry_max_tokens), secret_key, url,
+                                        call=call)
+    if _truncated(response_json):
+        raise LLMError(f"Réponse tronquée par la limite de {MAX_COMPLETION_TOKENS} tokens")
+    content = response_json['choices'][0]['message']['content'].strip()
+    if cache is not None:
+        # Réponse d'un modèle de secours (KeyPool) : rangée sous ce modèle, pas sous celui demandé
+        if call["model"] != model:
+            cache_key = cache.make_key(url, call["model"], systeme, prompt, temperature, max_tokens)
+        cache.set(cache_key, content)
+    return content
+
+# Fonction pour ajouter des occurrences de mots
+def add_word_occurrences(existing_text, words_with_occurrences, secret_key, user_prompt, temperature, cache=None,
+                         base_url=None):
+    prompt, system_message = generation_messages(existing_text, user_prompt)
+    return GPT35(prompt, system_message, secret_key, temperature, max_tokens=max_tokens_for_words(), cache=cache,
+                 base_url=base_url)
+
+# Fonction pour vérifier la cohérence des textes
+def review_content(text, secret_key, temperature, cache=None, fix_heading_case=True, base_url=None):
+    review_prompt, review_system_message = review_messages(text, fix_heading_case)
+    return GPT35(review_prompt, review_system_message, secret_key, temperature, max_tokens=max_tokens_for_text(text), cache=cache,
+                 base_url=base_url)
+
+# Fonction pour ajouter uniquement les mots-clés manquants, sans réécrire tout le texte
+def correct_missing_keywords(text, missing_keywords, secret_key, temperature, cache=None, base_url=None):
+    correction_prompt, correction_system_message = correction_messages(text, missing_keywords)
+    return GPT35(correction_prompt, correction_system_message, secret_key, temperature,
+                 max_tokens=max_tokens_for_text(text), cache=cache, base_url=base_url)
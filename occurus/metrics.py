@@ -0,0 +1,197 @@
+import json
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+
+from occurus.client import add_call_hook
+
+# Prix en dollars par million de tokens : (entrée, entrée servie par le cache de prompts, sortie)
+PRICES = {
+    "gpt-4o-mini": (0.15, 0.075, 0.60),
+    "gpt-4o": (2.50, 1.25, 10.00),
+    "gpt-4.1-mini": (0.40, 0.10, 1.60),
+    "gpt-4.1-nano": (0.10, 0.025, 0.40),
+}
+
+# Nombre de latences conservées pour le calcul des percentiles
+LATENCY_WINDOW = 10000
+
+_row = threading.local()
+
+
+# Coût estimé d'un appel à partir de son champ usage
+def estimate_cost(model, usage):
+    input_price, cached_price, output_price = PRICES.get(model, PRICES["gpt-4o-mini"])
+    usage = usage or {}
+    cached_tokens = (usage.get("prompt_tokens_details") or {}).get("cached_tokens", 0)
+    uncached_tokens = usage.get("prompt_tokens", 0) - cached_tokens
+    return (uncached_tokens * input_price + cached_tokens * cached_price
+            + usage.get("completion_tokens", 0) * output_price) / 1_000_000
+
+
+def _percentile(values, fraction):
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(round(fraction * (len(ordered) - 1))))]
+
+
+# Mesures d'un traitement : appels LLM (latence, statut, tokens, coût, erreurs) et lignes terminées
+class MetricsRecorder:
+    def __init__(self, total_rows=0):
+        self.total_rows = total_rows
+        self.started = time.monotonic()
+        self._lock = threading.Lock()
+        self._latencies = deque(maxlen=LATENCY_WINDOW)
+        self.latency_total = 0.0
+        self.calls = 0
+        self.errors = 0
+        self.retries = 0
+        self.statuses = {}
+        self.prompt_tokens = 0
+        self.cached_tokens = 0
+        self.completion_tokens = 0
+        self.cost = 0.0
+        self.rows = 0
+
+    def record_call(self, call):
+        usage = call.get("usage") or {}
+        with self._lock:
+            self.calls += 1
+            self.errors += call.get("error") is not None
+            self.retries += max(0, call.get("attempts", 1) - 1)
+            status = str(call.get("status"))
+            self.statuses[status] = self.statuses.get(status, 0) + 1
+            self._latencies.append(call["latency"])
+            self.latency_total += call["latency"]
+            self.prompt_tokens += usage.get("prompt_tokens", 0)
+            self.cached_tokens += (usage.get("prompt_tokens_details") or {}).get("cached_tokens", 0)
+            self.completion_tokens += usage.get("completion_tokens", 0)
+            self.cost += estimate_cost(call.get("model"), usage)
+
+    def record_row(self):
+        with self._lock:
+            self.rows += 1
+
+    def snapshot(self):
+        with self._lock:
+            elapsed = max(time.monotonic() - self.started, 1e-9)
+            latencies = list(self._latencies)
+            rows_per_second = self.rows / elapsed
+            remaining_rows = max(0, self.total_rows - self.rows)
+            return {
+                "elapsed_seconds": round(elapsed, 3),
+                "rows": self.rows,
+                "total_rows": self.total_rows,
+                "rows_per_minute": round(rows_per_second * 60, 2),
+                "tokens_per_second": round((self.prompt_tokens + self.completion_tokens) / elapsed, 2),
+                "latency_p50_seconds": round(_percentile(latencies, 0.50), 3),
+                "latency_p95_seconds": round(_percentile(latencies, 0.95), 3),
+                "latency_total_seconds": round(self.latency_total, 3),
+                "eta_seconds": round(remaining_rows / rows_per_second, 1) if rows_per_second else None,
+                "calls": self.calls,
+                "errors": self.errors,
+                "retries": self.retries,
+                "statuses": dict(self.statuses),
+                "prompt_tokens": self.prompt_tokens,
+                "cached_tokens": self.cached_tokens,
+                "completion_tokens": self.completion_tokens,
+                "cost_usd": round(self.cost, 6),
+            }
+
+    # Résumé lisible des tokens consommés, dont ceux servis par le cache de prompts du fournisseur
+    def usage_summary(self):
+        snapshot = self.snapshot()
+        cached_share = 100 * snapshot["cached_tokens"] / snapshot["prompt_tokens"] if snapshot["prompt_tokens"] else 0
+        return (f"Tokens : {snapshot['prompt_tokens']} en entrée dont {snapshot['cached_tokens']} servis par le cache "
+                f"de prompts ({cached_share:.0f} %), {snapshot['completion_tokens']} en sortie, "
+                f"sur {snapshot['calls'] - snapshot['errors']} requêtes.")
+
+    def to_json(self):
+        return json.dumps(self.snapshot(), indent=2)
+
+    # Format texte d'exposition Prometheus
+    def to_prometheus(self, prefix="occurus"):
+        snapshot = self.snapshot()
+        lines = []
+
+        # samples : (suffixe du nom et/ou étiquettes, valeur) de chaque série, par exemple ('_sum', 1.5)
+        def metric(name, kind, value, help_text, samples=None):
+            lines.append(f"# HELP {prefix}_{name} {help_text}")
+            lines.append(f"# TYPE {prefix}_{name} {kind}")
+            for suffix, sample_value in (samples or [("", value)]):
+                lines.append(f"{prefix}_{name}{suffix} {sample_value}")
+
+        metric("rows_total", "counter", snapshot["rows"], "Lignes terminées")
+        metric("rows_per_minute", "gauge", snapshot["rows_per_minute"], "Débit en lignes par minute")
+        metric("tokens_per_second", "gauge", snapshot["tokens_per_second"], "Débit en tokens par seconde")
+        metric("llm_calls_total", "counter", snapshot["calls"], "Appels LLM par statut HTTP",
+               [(f'{{status="{status}"}}', count) for status, count in sorted(snapshot["statuses"].items())])
+        metric("llm_errors_total", "counter", snapshot["errors"], "Appels LLM en échec définitif")
+        metric("llm_retries_total", "counter", snapshot["retries"], "Nouvelles tentatives")
+        # Quantiles calculés sur les derniers appels (LATENCY_WINDOW), somme et nombre sur tout le traitement
+        metric("llm_latency_seconds", "summary", None, "Latence des appels LLM",
+               [('{quantile="0.5"}', snapshot["latency_p50_seconds"]),
+                ('{quantile="0.95"}', snapshot["latency_p95_seconds"]),
+                ("_sum", snapshot["latency_total_seconds"]),
+                ("_count", snapshot["calls"])])
+        metric("tokens_total", "counter", None, "Tokens facturés",
+               [('{kind="prompt"}', snapshot["prompt_tokens"]),
+                ('{kind="completion"}', snapshot["completion_tokens"])])
+        # Sous-ensemble des tokens d'entrée : une série à part pour que la somme de tokens_total reste juste
+        metric("cached_prompt_tokens_total", "counter", snapshot["cached_tokens"],
+               "Tokens d'entrée servis par le cache de prompts (inclus dans tokens_total{kind=\"prompt\"})")
+        metric("cost_usd_total", "counter", snapshot["cost_usd"], "Coût estimé en dollars")
+        if snapshot["eta_seconds"] is not None:
+            metric("eta_seconds", "gauge", snapshot["eta_seconds"], "Temps restant estimé")
+        return "\n".join(lines) + "\n"
+
+
+# Recorder actif du thread courant : chaque traitement (session Streamlit, commande) n'enregistre que ses appels
+_active = threading.local()
+
+
+def _on_call(call):
+    row_stats = getattr(_row, "stats", None)
+    if row_stats is not None:
+        usage = call.get("usage") or {}
+        row_stats["Appels LLM"] += 1
+        row_stats["Tokens entrée"] += usage.get("prompt_tokens", 0)
+        row_stats["Tokens sortie"] += usage.get("completion_tokens", 0)
+    recorder = current_recorder()
+    if recorder is not None:
+        recorder.record_call(call)
+
+
+add_call_hook(_on_call)
+
+
+# Enregistrer dans recorder les appels LLM faits par ce thread pendant le bloc. Les threads de travail
+# reprennent le recorder du thread qui leur confie les lignes (voir run_rows_concurrently).
+@contextmanager
+def recording(recorder):
+    previous = current_recorder()
+    _active.recorder = recorder
+    try:
+        yield recorder
+    finally:
+        _active.recorder = previous
+
+
+def current_recorder():
+    return getattr(_active, "recorder", None)
+
+
+# Mesures d'une ligne : durée, appels et tokens des appels LLM faits dans ce thread pendant le bloc
+@contextmanager
+def row_metrics():
+    stats = {"Durée (s)": 0.0, "Appels LLM": 0, "Tokens entrée": 0, "Tokens sortie": 0}
+    previous = getattr(_row, "stats", None)
+    _row.stats = stats
+    started = time.perf_counter()
+    try:
+        yield stats
+    finally:
+        stats["Durée (s)"] = round(time.perf_counter() - started, 3)
+        _row.stats = previous
@@ -0,0 +1,345 @@
+import ast
+import email.parser
+import email.policy
+import json
+import math
+import random
+import re
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+# Serveur local imitant POST /v1/chat/completions, pour mesurer le pipeline sans appeler OpenAI.
+# Latence, taux d'erreurs 429/5xx, limites RPM/TPM par clé et par modèle, et clés révoquées (401)
+# sont paramétrables ; les réponses portent les en-têtes x-ratelimit-* et un champ usage comme l'API réelle.
+# Les routes /files et /batches de l'API Batch sont aussi simulées : un batch est traité dès sa création.
+
+CHARS_PER_TOKEN = 4
+FILLER = ("Ce texte simulé sert uniquement à mesurer le débit du pipeline de rédaction "
+          "et ne reflète en rien la qualité d'une réponse réelle").split()
+
+_KEYWORD = re.compile(r"Mot clé principal : (.*)")
+_OCCURRENCES = re.compile(r"Occurrences des mots à incorporer :\n(.*?)(?:\n\n|$)", re.S)
+_MISSING = re.compile(r"^- (.+?) : (\d+) occurrence\(s\) trouvée\(s\) sur (\d+)", re.M)
+_TEXT_MARKERS = ("Voici le texte généré :\n", "Voici le texte :\n")
+
+
+# Tirage des latences : "fixed:0.2", "uniform:0.1,0.5", "normal:0.3,0.1", "lognormal:0.3,0.5"
+# (médiane, sigma) ou "exponential:0.3" (moyenne), en secondes
+def latency_sampler(spec, rng=None):
+    rng = rng or random.Random()
+    name, _, arguments = spec.partition(":")
+    values = [float(value) for value in arguments.split(",") if value]
+    samplers = {
+        "fixed": lambda: values[0],
+        "uniform": lambda: rng.uniform(values[0], values[1]),
+        "normal": lambda: rng.gauss(values[0], values[1]),
+        "lognormal": lambda: rng.lognormvariate(math.log(values[0]), values[1]),
+        "exponential": lambda: rng.expovariate(1 / values[0]),
+    }
+    if name not in samplers:
+        raise ValueError(f"Distribution de latence inconnue : {name}")
+    sample = samplers[name]
+    return lambda: max(0.0, sample())
+
+
+def _estimate_tokens(text):
+    return max(1, len(text) // CHARS_PER_TOKEN)
+
+
+def _format_reset(seconds):
+    return f"{int(seconds * 1000)}ms" if seconds < 1 else f"{seconds:.3f}s"
+
+
+# Seau à jetons rechargé en continu : capacity par minute
+class _Bucket:
+    def __init__(self, capacity):
+        self.capacity = capacity
+        self.level = float(capacity)
+        self.updated = time.monotonic()
+
+    def _refill(self):
+        now = time.monotonic()
+        self.level = min(self.capacity, self.level + (now - self.updated) * self.capacity / 60)
+        self.updated = now
+
+    # Délai avant que amount soit disponible (0 s'il l'est déjà)
+    def delay(self, amount):
+        self._refill()
+        return max(0.0, (amount - self.level) * 60 / self.capacity)
+
+    def take(self, amount):
+        self.level -= amount
+
+    def reset_after(self):
+        return (self.capacity - self.level) * 60 / self.capacity
+
+
+def _words_text(main_keyword, words_with_occurrences):
+    sections = [f"<h2>{main_keyword}</h2>"]
+    for word, required in words_with_occurrences.items():
+        sentence = " ".join([word] * int(required) + FILLER[:8])
+        sections.append(f"<h3>{word}</h3><p>{sentence}.</p>")
+    sections.append(f"<p>{' '.join(FILLER)}.</p>")
+    return "\n".join(sections)
+
+
+def _parse_occurrences(prompt):
+    match = _OCCURRENCES.search(prompt)
+    if not match:
+        return {}
+    try:
+        return json.loads(match.group(1))
+    except json.JSONDecodeError:
+        try:
+            return ast.literal_eval(match.group(1))
+        except (ValueError, SyntaxError):
+            return {}
+
+
+# Réponse simulée : génération à partir des occurrences demandées, révision renvoyant le texte reçu,
+# correction ajoutant les occurrences manquantes
+def simulated_content(prompt):
+    keyword_match = _KEYWORD.search(prompt)
+    if keyword_match:
+        return _words_text(keyword_match.group(1), _parse_occurrences(prompt))
+    for marker in _TEXT_MARKERS:
+        if marker in prompt:
+            head, _, text = prompt.rpartition(marker)
+            additions = [f"<p>{' '.join([word] * (int(required) - int(found)))}.</p>"
+                         for word, found, required in _MISSING.findall(head)]
+            return "\n".join([text] + additions)
+    return " ".join(FILLER)
+
+
+# Corps d'une réponse chat/completions réussie, tronquée à max_tokens comme l'API réelle
+def completion_body(payload, request_id):
+    messages = payload["messages"]
+    prompt_tokens = _estimate_tokens("".join(message.get("content") or "" for message in messages))
+    max_tokens = payload.get("max_tokens") or 4096
+    content = simulated_content(messages[-1].get("content") or "")
+    finish_reason = "stop"
+    if _estimate_tokens(content) > max_tokens:
+        content, finish_reason = content[:max_tokens * CHARS_PER_TOKEN], "length"
+    return {
+        "id": f"chatcmpl-mock-{request_id}",
+        "object": "chat.completion",
+        "created": int(time.time()),
+        "model": payload.get("model"),
+        "choices": [{"index": 0, "message": {"role": "assistant", "content": content},
+                     "finish_reason": finish_reason}],
+        "usage": {
+            "prompt_tokens": prompt_tokens,
+            "completion_tokens": _estimate_tokens(content),
+            "total_tokens": prompt_tokens + _estimate_tokens(content),
+            "prompt_tokens_details": {"cached_tokens": 0},
+        },
+    }
+
+
+# Fichier déposé en multipart/form-data sur /files : contenu du champ « file »
+def _uploaded_file(content_type, raw_body):
+    message = email.parser.BytesParser(policy=email.policy.default).parsebytes(
+        b"Content-Type: " + content_type.encode("latin-1") + b"\r\n\r\n" + raw_body)
+    for part in message.iter_parts():
+        if part.get_param("name", header="content-disposition") == "file":
+            return part.get_payload(decode=True)
+    return None
+
+
+class MockChatServer(ThreadingHTTPServer):
+    daemon_threads = True
+
+    def __init__(self, address, latency="lognormal:0.3,0.5", error_429_rate=0.0, error_5xx_rate=0.0,
+                 rpm=None, tpm=None, retry_after=0.5, seed=None, revoked_keys=()):
+        super().__init__(address, _Handler)
+        self.random = random.Random(seed)
+        self.latency = latency_sampler(latency, self.random)
+        self.error_429_rate = error_429_rate
+        self.error_5xx_rate = error_5xx_rate
+        self.rpm = rpm
+        self.tpm = tpm
+        self.retry_after = retry_after
+        self.revoked_keys = set(revoked_keys)
+        self.lock = threading.Lock()
+        self.buckets = {}
+        self.requests_served = 0
+        self.files = {}
+        self.batches = {}
+
+    @property
+    def base_url(self):
+        host, port = self.server_address[:2]
+        return f"http://{host}:{port}/v1"
+
+    # Limites d'une clé pour un modèle (comme l'API réelle) : tirage des erreurs injectées puis consommation des seaux RPM/TPM.
+    # Renvoie (statut d'erreur ou None, en-têtes x-ratelimit-* et retry-after-ms)
+    def admit(self, secret_key, model, tokens):
+        with self.lock:
+            self.requests_served += 1
+            draw = self.random.random()
+            requests_bucket, tokens_bucket = self.buckets.setdefault(
+                (secret_key, model), (_Bucket(self.rpm) if self.rpm else None, _Bucket(self.tpm) if self.tpm else None))
+            status, delay = None, 0.0
+            if draw < self.error_429_rate:
+                status, delay = 429, self.retry_after
+            elif draw < self.error_429_rate + self.error_5xx_rate:
+                status = self.random.choice((500, 502, 503))
+            else:
+                demands = [(bucket, amount) for bucket, amount in ((requests_bucket, 1), (tokens_bucket, tokens)) if bucket]
+                delay = max([bucket.delay(amount) for bucket, amount in demands], default=0.0)
+                if delay:
+                    status = 429
+                else:
+                    for bucket, amount in demands:
+                        bucket.take(amount)
+            headers = {}
+            for name, bucket in (("requests", requests_bucket), ("tokens", tokens_bucket)):
+                if bucket:
+                    headers[f"x-ratelimit-limit-{name}"] = str(bucket.capacity)
+                    headers[f"x-ratelimit-remaining-{name}"] = str(int(bucket.level))
+                    headers[f"x-ratelimit-reset-{name}"] = _format_reset(bucket.reset_after())
+            if status == 429:
+                headers["retry-after-ms"] = str(int(delay * 1000))
+            return status, headers
+
+
+    def add_file(self, content):
+        with self.lock:
+            file_id = f"file-mock-{len(self.files) + 1}"
+            self.files[file_id] = content
+        return file_id
+
+    # Traiter tout un fichier d'entrée : chaque requête réussit, sauf la part error_5xx_rate tirée en erreur.
+    # Le batch est renvoyé déjà terminé, avec ses fichiers de sortie et d'erreurs.
+    def create_batch(self, input_file_id):
+        outputs, errors = [], []
+        for line in self.files[input_file_id].decode("utf-8").splitlines():
+            if not line.strip():
+                continue
+            request = json.loads(line)
+            with self.lock:
+                self.requests_served += 1
+                request_id = self.requests_served
+                failed = self.random.random() < self.error_5xx_rate
+            if failed:
+                errors.append({"custom_id": request["custom_id"], "response": {
+                    "status_code": 500, "body": {"error": {"message": "Erreur simulée du serveur"}}}})
+            else:
+                outputs.append({"custom_id": request["custom_id"], "response": {
+                    "status_code": 200, "body": completion_body(request["body"], request_id)}})
+        with self.lock:
+            batch_id = f"batch-mock-{len(self.batches) + 1}"
+            batch = {
+                "id": batch_id,
+                "object": "batch",
+                "status": "completed",
+                "input_file_id": input_file_id,
+                "output_file_id": None,
+                "error_file_id": None,
+                "request_counts": {"total": len(outputs) + len(errors), "completed": len(outputs),
+                                   "failed": len(errors)},
+            }
+            self.batches[batch_id] = batch
+        for file_key, entries in (("output_file_id", outputs), ("error_file_id", errors)):
+            if entries:
+                batch[file_key] = self.add_file("".join(json.dumps(entry, ensure_ascii=False) + "\n"
+                                                        for entry in entries).encode("utf-8"))
+        return batch
+
+
+class _Handler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+
+    def log_message(self, *args):
+        pass
+
+    def _send(self, status, body, headers=()):
+        data = json.dumps(body, ensure_ascii=False).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(data)))
+        for name, value in dict(headers).items():
+            self.send_header(name, value)
+        self.end_headers()
+        self.wfile.write(data)
+
+    def _send_file(self, content):
+        self.send_response(200)
+        self.send_header("Content-Type", "application/octet-stream")
+        self.send_header("Content-Length", str(len(content)))
+        self.end_headers()
+        self.wfile.write(content)
+
+    def _not_found(self):
+        self._send(404, {"error": {"message": f"Route inconnue : {self.path}"}})
+
+    def do_GET(self):
+        parts = self.path.strip("/").split("/")
+        if len(parts) == 3 and parts[-2] == "batches" and parts[-1] in self.server.batches:
+            self._send(200, self.server.batches[parts[-1]])
+        elif len(parts) == 4 and parts[-3] == "files" and parts[-1] == "content" and parts[-2] in self.server.files:
+            self._send_file(self.server.files[parts[-2]])
+        else:
+            self._not_found()
+
+    def do_POST(self):
+        length = int(self.headers.get("Content-Length") or 0)
+        raw_body = self.rfile.read(length)
+        path = self.path.rstrip("/")
+        if path.endswith("/files"):
+            self._upload(raw_body)
+        elif path.endswith("/batches"):
+            self._create_batch(raw_body)
+        elif path.endswith("/chat/completions"):
+            self._chat_completion(raw_body)
+        else:
+            self._not_found()
+
+    def _upload(self, raw_body):
+        content = _uploaded_file(self.headers.get("Content-Type") or "", raw_body)
+        if content is None:
+            self._send(400, {"error": {"message": "Champ « file » manquant"}})
+            return
+        self._send(200, {"id": self.server.add_file(content), "object": "file", "purpose": "batch",
+                         "bytes": len(content)})
+
+    def _create_batch(self, raw_body):
+        try:
+            input_file_id = json.loads(raw_body)["input_file_id"]
+        except (ValueError, KeyError, TypeError):
+            self._send(400, {"error": {"message": "Corps de requête invalide"}})
+            return
+        if input_file_id not in self.server.files:
+            self._send(404, {"error": {"message": f"Fichier inconnu : {input_file_id}"}})
+            return
+        self._send(200, self.server.create_batch(input_file_id))
+
+    def _chat_completion(self, raw_body):
+        try:
+            payload = json.loads(raw_body)
+            messages = payload["messages"]
+        except (ValueError, KeyError, TypeError):
+            self._send(400, {"error": {"message": "Corps de requête invalide"}})
+            return
+
+        secret_key = (self.headers.get("Authorization") or "").removeprefix("Bearer ")
+        if secret_key in self.server.revoked_keys:
+            self._send(401, {"error": {"message": "Incorrect API key provided", "code": "invalid_api_key"}})
+            return
+        prompt_tokens = _estimate_tokens("".join(message.get("content") or "" for message in messages))
+        max_tokens = payload.get("max_tokens") or 4096
+        status, headers = self.server.admit(secret_key, payload.get("model"), prompt_tokens + max_tokens)
+        time.sleep(self.server.latency())
+        if status is not None:
+            message = "Rate limit reached" if status == 429 else "Erreur simulée du serveur"
+            self._send(status, {"error": {"message": message, "type": "mock_error"}}, headers)
+            return
+        self._send(200, completion_body(payload, self.server.requests_served), headers)
+
+
+# Démarrer le serveur simulé dans un thread ; server.base_url donne l'URL à passer en base_url
+def start_mock_server(host="127.0.0.1", port=0, **options):
+    server = MockChatServer((host, port), **options)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
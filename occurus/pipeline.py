@@ -0,0 +1,290 @@
+import hashlib
+import json
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, as_completed, wait
+
+from occurus.batch import POLL_INTERVAL, run_batch
+from occurus.client import LLMError
+from occurus.llm import add_word_occurrences, build_payload, correct_missing_keywords, review_content
+from occurus.metrics import current_recorder, recording, row_metrics
+from occurus.prompts import build_user_prompt, generation_messages, review_messages
+from occurus.scoring import score_occurrences
+from occurus.sheets import iter_sheet_chunks
+from occurus.tokens import MAX_SOURCE_TOKENS, SOURCE_TRUNCATE, SourceTooLong, fit_source_text, max_tokens_for_text, max_tokens_for_words
+
+# Modes de révision : relecture systématique, ou adaptative selon le score du premier jet
+REVIEW_SYSTEMATIC = "systematic"
+REVIEW_ADAPTIVE = "adaptive"
+
+# Colonnes ajoutées au tableur, avec leur valeur pour une ligne pas encore traitée
+RESULT_COLUMNS = {
+    'Texte Modifié': "",
+    'Texte Révisé': "",
+    'Score Occurrences (%)': 0.0,
+    'Détail Occurrences': "",  # Nombre d'occurrences trouvées par mot-clé
+    'Révision': "",  # Révision appliquée : complète, ignorée ou corrections ciblées
+    'Statut': "",  # Colonne pour signaler les lignes en échec
+    'Durée (s)': 0.0,  # Temps de traitement de la ligne
+    'Appels LLM': 0,  # Appels effectivement envoyés à l'API (hors réponses du cache)
+    'Tokens entrée': 0,
+    'Tokens sortie': 0,
+    'Doublon de la ligne': "",  # Ligne dont le résultat a été recopié (mêmes données), sans nouvel appel
+}
+
+# Colonnes numériques des résultats (typées comme telles à l'export)
+NUMERIC_RESULT_COLUMNS = ['Score Occurrences (%)', 'Durée (s)', 'Appels LLM', 'Tokens entrée', 'Tokens sortie']
+
+# Valider une ligne du tableur et renvoyer (mot clé, texte source, occurrences).
+# Lève ValueError avec un message lisible si la ligne doit être écartée.
+def parse_row(index, row, source_policy=SOURCE_TRUNCATE, max_source_tokens=MAX_SOURCE_TOKENS):
+    import pandas as pd
+
+    main_keyword = row['keyword']
+    if pd.isna(main_keyword) or not str(main_keyword).strip():
+        raise ValueError(f"Ligne {index + 1} ignorée : mot clé principal manquant.")
+    existing_text = row['Text or not'] if pd.notna(row['Text or not']) else ""
+
+    # Charger les occurrences en JSON
+    try:
+        words_with_occurrences = json.loads(row['Occurrences'])
+    except (TypeError, json.JSONDecodeError):
+        raise ValueError(f"Erreur de format JSON dans la ligne {index + 1}. Veuillez vérifier le format des occurrences.") from None
+    if not isinstance(words_with_occurrences, dict) or not all(
+            isinstance(count, (int, float)) and not isinstance(count, bool) and count >= 0
+            for count in words_with_occurrences.values()):
+        raise ValueError(f"Ligne {index + 1} ignorée : les occurrences doivent être un objet JSON {{\"mot\": nombre}}.")
+
+    try:
+        existing_text = fit_source_text(existing_text, max_source_tokens, source_policy)
+    except SourceTooLong as error:
+        raise ValueError(f"Ligne {index + 1} ignorée : {error}") from None
+    return main_keyword, existing_text, words_with_occurrences
+
+# Lire le tableur bloc par bloc et produire les tâches des lignes restant à traiter.
+# Les textes sources trop longs sont tronqués ou refusés (source_policy) avant tout envoi.
+# on_invalid(index, message) est appelé pour chaque ligne écartée (JSON invalide, texte source refusé).
+# only_rows limite les tâches à ces lignes (par exemple les représentants retenus par preflight).
+def iter_jobs(source, source_format, finished_rows=(), on_invalid=None,
+              source_policy=SOURCE_TRUNCATE, max_source_tokens=MAX_SOURCE_TOKENS, only_rows=None):
+    for chunk in iter_sheet_chunks(source, source_format):
+        for index, row in chunk.iterrows():
+            # Ligne déjà générée lors d'une exécution précédente
+            if index in finished_rows or (only_rows is not None and index not in only_rows):
+                continue
+            try:
+                yield (index, *parse_row(index, row, source_policy, max_source_tokens))
+            except ValueError as error:
+                if on_invalid is not None:
+                    on_invalid(index, str(error))
+
+# Bilan de la pré-validation : lignes à traiter, doublons regroupés et erreurs, connus avant tout appel
+class Preflight:
+    def __init__(self):
+        self.rows = 0
+        self.errors = []  # (index, message) de chaque ligne écartée
+        self.job_rows = set()  # Une ligne représentante par groupe de lignes identiques
+        self.duplicates = {}  # Ligne représentante -> lignes identiques qui recevront son résultat
+
+    @property
+    def duplicate_rows(self):
+        return sum(map(len, self.duplicates.values()))
+
+    # Appels évités par le regroupement : au moins calls_per_row par ligne en double
+    def summary(self, calls_per_row=2):
+        message = f"{self.rows} lignes restantes, {len(self.errors)} en erreur, {len(self.job_rows)} tâches à lancer"
+        if self.duplicate_rows:
+            message += (f" ; {self.duplicate_rows} doublons regroupés : "
+                        f"au moins {self.duplicate_rows * calls_per_row} appels à l'API évités")
+        return message + "."
+
+# Valider toutes les lignes restant à traiter avant de lancer le moindre appel, et regrouper les lignes
+# identiques (mot clé, occurrences, texte source et réglages) en une seule tâche.
+# Seule une empreinte par ligne est gardée en mémoire : les tâches sont relues ensuite avec iter_jobs(only_rows=...).
+def preflight(source, source_format, finished_rows=(), source_policy=SOURCE_TRUNCATE,
+              max_source_tokens=MAX_SOURCE_TOKENS, settings=()):
+    report = Preflight()
+    representatives = {}
+    for chunk in iter_sheet_chunks(source, source_format):
+        for index, row in chunk.iterrows():
+            if index in finished_rows:
+                continue
+            report.rows += 1
+            try:
+                main_keyword, existing_text, words_with_occurrences = parse_row(index, row, source_policy, max_source_tokens)
+            except ValueError as error:
+                report.errors.append((index, str(error)))
+                continue
+            fingerprint = hashlib.sha1(json.dumps(
+                [str(main_keyword), existing_text, sorted(words_with_occurrences.items()), list(settings)],
+                ensure_ascii=False, default=str).encode("utf-8")).digest()
+            representative = representatives.setdefault(fingerprint, index)
+            if representative == index:
+                report.job_rows.add(index)
+            else:
+                report.duplicates.setdefault(representative, []).append(index)
+    return report
+
+# Résultat recopié sur une ligne en double : aucune durée ni consommation propre
+def _duplicate_result(result, representative):
+    return {**result, 'Doublon de la ligne': representative + 1,
+            'Durée (s)': 0.0, 'Appels LLM': 0, 'Tokens entrée': 0, 'Tokens sortie': 0}
+
+# Résultats d'une ligne et de ses doublons, journalisés ensemble
+def _fan_out(index, result, duplicates, journal):
+    results = [(index, result)] + [(duplicate, _duplicate_result(result, index))
+                                   for duplicate in (duplicates or {}).get(index, ())]
+    if journal is not None:
+        for row_index, row_result in results:
+            journal.record(row_index, row_result)
+    return results
+
+# Révision adaptative : le premier jet est noté, la relecture est sautée s'il atteint le seuil,
+# sinon des corrections ciblées sur les seuls mots-clés manquants sont demandées (nombre borné).
+# Si le seuil reste hors d'atteinte (corrections épuisées ou plus aucun mot manquant), la relecture complète est faite.
+def adaptive_review(draft, words_with_occurrences, secret_key, temperature, cache=None,
+                    score_threshold=100.0, max_corrections=2, base_url=None, fix_heading_case=True):
+    text = draft
+    occurrence_score, occurrence_counts = score_occurrences(text, words_with_occurrences)
+    corrections = 0
+    while occurrence_score < score_threshold and corrections < max_corrections:
+        missing_keywords = {
+            word: (required, occurrence_counts[word])
+            for word, required in words_with_occurrences.items()
+            if occurrence_counts[word] < required
+        }
+        if not missing_keywords:
+            break
+        text = correct_missing_keywords(text, missing_keywords, secret_key, temperature, cache, base_url)
+        occurrence_score, occurrence_counts = score_occurrences(text, words_with_occurrences)
+        corrections += 1
+    if occurrence_score >= score_threshold:
+        review_summary = f"Corrections ciblées : {corrections}" if corrections else "Ignorée (score atteint)"
+    else:
+        text = review_content(text, secret_key, temperature, cache, fix_heading_case, base_url)
+        occurrence_score, occurrence_counts = score_occurrences(text, words_with_occurrences)
+        review_summary = "Complète (seuil non atteint)"
+        if corrections:
+            review_summary = f"Corrections ciblées : {corrections}, puis complète (seuil non atteint)"
+    return text, occurrence_score, occurrence_counts, review_summary
+
+# Chaîne complète génération → révision → score pour une ligne, avec sa durée et ses tokens consommés.
+# base_url : API visée par cette ligne (par défaut celle du processus, voir occurus.client) ;
+# fix_heading_case : la relecture corrige aussi la casse des titres
+def process_row(main_keyword, existing_text, words_with_occurrences, secret_key, temperature, cache=None,
+                review_mode=REVIEW_SYSTEMATIC, score_threshold=100.0, max_corrections=2, base_url=None,
+                fix_heading_case=True):
+    with row_metrics() as stats:
+        result = _process_row(main_keyword, existing_text, words_with_occurrences, secret_key, temperature, cache,
+                              review_mode, score_threshold, max_corrections, base_url, fix_heading_case)
+    result.update(stats)
+    return result
+
+def _process_row(main_keyword, existing_text, words_with_occurrences, secret_key, temperature, cache,
+                 review_mode, score_threshold, max_corrections, base_url, fix_heading_case):
+    user_prompt = build_user_prompt(main_keyword, words_with_occurrences)
+    try:
+        modified_text = add_word_occurrences(existing_text, words_with_occurrences, secret_key, user_prompt, temperature, cache,
+                                             base_url)
+        if review_mode == REVIEW_ADAPTIVE:
+            reviewed_text, occurrence_score, occurrence_counts, review_summary = adaptive_review(
+                modified_text, words_with_occurrences, secret_key, temperature, cache, score_threshold, max_corrections,
+                base_url, fix_heading_case)
+        else:
+            reviewed_text = review_content(modified_text, secret_key, temperature, cache, fix_heading_case, base_url)
+            occurrence_score, occurrence_counts = score_occurrences(reviewed_text, words_with_occurrences)
+            review_summary = "Complète"
+    except LLMError as error:
+        # La ligne est marquée en échec au lieu d'interrompre tout le traitement
+        return {'Statut': f"Échec : {error}"}
+    return {
+        'Texte Modifié': modified_text,
+        'Texte Révisé': reviewed_text,
+        'Score Occurrences (%)': occurrence_score,
+        'Détail Occurrences': json.dumps(occurrence_counts, ensure_ascii=False),
+        'Révision': review_summary,
+        'Statut': "OK",
+    }
+
+# Traiter les lignes avec un nombre borné de requêtes simultanées.
+# Les résultats sont renvoyés dans l'ordre de fin de traitement, avec leur index d'origine.
+# Chaque ligne terminée est journalisée depuis le thread de travail, même si le script Streamlit est interrompu.
+# duplicates (voir preflight) : le résultat d'une ligne est aussi renvoyé et journalisé pour ses doublons.
+def run_rows_concurrently(jobs, secret_key, temperature, max_workers, cache=None, journal=None, duplicates=None,
+                          **pipeline_options):
+    # Les appels d'une ligne sont comptés par le recorder du thread qui la soumet (voir metrics.recording)
+    def run_job(recorder, index, main_keyword, existing_text, words_with_occurrences):
+        with recording(recorder):
+            result = process_row(main_keyword, existing_text, words_with_occurrences, secret_key, temperature, cache,
+                                 **pipeline_options)
+        return _fan_out(index, result, duplicates, journal)
+
+    # Les tâches sont soumises au fil de l'eau : seules quelques lignes en attente sont gardées en mémoire
+    executor = ThreadPoolExecutor(max_workers=max_workers)
+    try:
+        futures = {}
+        for job in jobs:
+            futures[executor.submit(run_job, current_recorder(), *job)] = job[0]
+            # Fenêtre pleine : attendre une ligne terminée avant de lire la suivante
+            if len(futures) >= 2 * max_workers:
+                done, _ = wait(futures, return_when=FIRST_COMPLETED)
+                for future in done:
+                    futures.pop(future)
+                    yield from future.result()
+        for future in as_completed(futures):
+            yield from future.result()
+    finally:
+        # Sur une réexécution Streamlit, abandonner les lignes pas encore commencées sans bloquer
+        executor.shutdown(wait=False, cancel_futures=True)
+
+# Traitement hors ligne via l'API Batch : un premier batch de génération, puis un second de révision
+# pour les lignes générées. Les résultats sont rattachés aux lignes par custom_id (index de la ligne).
+# Avec un journal, les fichiers et batchs envoyés sont enregistrés à côté de lui au fil des envois :
+# un nouvel appel reprend l'interrogation là où elle s'était arrêtée, tant que la température n'a pas changé.
+def run_rows_in_batches(jobs, temperature, transport, journal=None, on_status=None, poll_interval=POLL_INTERVAL,
+                        duplicates=None):
+    rows = {str(index): (main_keyword, existing_text, words_with_occurrences)
+            for index, main_keyword, existing_text, words_with_occurrences in jobs}
+
+    state = journal.batch_state() if journal is not None else None
+    if not state or state.get("temperature") != temperature:
+        state = {"temperature": temperature, "stage": "generation", "generation": [], "review": []}
+
+    def run_stage(stage, label, payloads):
+        def save_state():
+            state["stage"] = stage
+            if journal is not None:
+                journal.save_batch_state(state)
+
+        return run_batch(payloads, transport, poll_interval,
+                         on_status=lambda *counts: on_status(label, *counts) if on_status else None,
+                         submissions=state[stage], on_submit=save_state)
+
+    generation_payloads = {}
+    for custom_id, (main_keyword, existing_text, words_with_occurrences) in rows.items():
+        prompt, system_message = generation_messages(existing_text, build_user_prompt(main_keyword, words_with_occurrences))
+        generation_payloads[custom_id] = build_payload(prompt, system_message, temperature, max_tokens=max_tokens_for_words())
+    # Repris depuis l'étape de révision, les textes générés sont simplement retéléchargés
+    generated, generation_errors = run_stage("generation", "Génération", generation_payloads)
+
+    review_payloads = {
+        custom_id: build_payload(*review_messages(modified_text), temperature, max_tokens=max_tokens_for_text(modified_text))
+        for custom_id, modified_text in generated.items() if custom_id in rows
+    }
+    reviewed, review_errors = run_stage("review", "Révision", review_payloads)
+
+    for custom_id, (main_keyword, existing_text, words_with_occurrences) in rows.items():
+        if custom_id in reviewed:
+            occurrence_score, occurrence_counts = score_occurrences(reviewed[custom_id], words_with_occurrences)
+            result = {
+                'Texte Modifié': generated[custom_id],
+                'Texte Révisé': reviewed[custom_id],
+                'Score Occurrences (%)': occurrence_score,
+                'Détail Occurrences': json.dumps(occurrence_counts, ensure_ascii=False),
+                'Révision': "Complète",
+                'Statut': "OK",
+            }
+        else:
+            error = generation_errors.get(custom_id) or review_errors.get(custom_id)
+            result = {'Statut': f"Échec : {error}"}
+        yield from _fan_out(int(custom_id), result, duplicates, journal)
+    if journal is not None:
+        journal.clear_batch_state()
@@ -0,0 +1,170 @@
+import json
+import re
+import unicodedata
+from collections import deque
+from functools import lru_cache
+from itertools import chain, repeat
+
+# Mots élidés (l', d', qu'...) : ignorés seulement quand une apostrophe les suit, pour que « t-shirt »,
+# « vitamine C » ou « USB type C » gardent leur lettre
+_ELIDED = frozenset({"c", "d", "j", "l", "m", "n", "s", "t", "qu", "jusqu", "lorsqu", "puisqu"})
+_APOSTROPHES = ("'", "’")
+_WORD = re.compile(r"\w+")
+
+# Mots invariables terminés par s ou x, laissés tels quels par _singular : sinon « mais » deviendrait « mai »,
+# « vers » « ver », « fois » « foi »... Les autres pluriels irréguliers restent approximés.
+_INVARIABLE = frozenset({
+    "mais", "jamais", "dans", "sans", "sous", "vers", "tres", "apres", "plus", "moins", "puis", "depuis",
+    "alors", "toujours", "parfois", "ailleurs", "dessus", "dessous", "fois", "temps", "corps", "jadis", "hormis",
+})
+_COMBINING_MARKS = re.compile("[\u0300-\u036f]")
+
+# Forme normalisée de chaque fragment de texte (mot entouré d'espaces, ponctuation comprise) déjà rencontré :
+# le découpage fin et unicodedata ne sont payés qu'une fois par fragment distinct
+_NORMALIZED = {}
+_NORMALIZED_MAX = 200000
+_MISSING = object()
+
+
+# Ramener un mot à une forme commune au singulier et au pluriel (chats → chat, journaux → journal)
+def _singular(token):
+    if len(token) <= 3 or token in _INVARIABLE:
+        return token
+    if token.endswith("aux") and not token.endswith("eaux"):
+        return token[:-3] + "al"
+    if token[-1] in "sx":
+        return token[:-1]
+    return token
+
+
+# Normaliser un mot déjà en minuscules : sans accents ni ligatures, au singulier
+def _normalize_word(word):
+    token = word.replace("œ", "oe").replace("æ", "ae").replace("ß", "ss")
+    token = _COMBINING_MARKS.sub("", unicodedata.normalize("NFKD", token))
+    return _singular(token)
+
+
+# Mots normalisés d'un fragment sans espace (« l'arbre, » → ("arbre",)) ; un mot élidé n'est retiré
+# que s'il est suivi d'une apostrophe
+def _normalize_chunk(chunk):
+    return tuple(_normalize_word(match.group()) for match in _WORD.finditer(chunk)
+                 if not (match.group() in _ELIDED and chunk[match.end():match.end() + 1] in _APOSTROPHES))
+
+
+# Découper un texte en mots normalisés : sans casse, sans accents, sans élisions, au singulier
+def normalize_tokens(text):
+    if not unicodedata.is_normalized("NFC", text):
+        text = unicodedata.normalize("NFC", text)
+    if len(_NORMALIZED) > _NORMALIZED_MAX:
+        _NORMALIZED.clear()
+    chunks = text.casefold().split()
+    normalized = list(map(_NORMALIZED.get, chunks, repeat(_MISSING, len(chunks))))
+    if _MISSING in normalized:
+        for position, chunk in enumerate(chunks):
+            if normalized[position] is _MISSING:
+                normalized[position] = _NORMALIZED[chunk] = _normalize_chunk(chunk)
+    return list(chain.from_iterable(normalized))
+
+
+# Automate d'Aho-Corasick sur des séquences de mots : tous les mots-clés sont trouvés en une seule passe,
+# uniquement sur des mots entiers (« chat » ne correspond pas à « château »).
+class OccurrenceMatcher:
+    def __init__(self, keywords):
+        self.keywords = list(keywords)
+        self._goto = [{}]
+        self._fail = [0]
+        self._output = [[]]
+        self._vocabulary = set()
+        for keyword_id, keyword in enumerate(self.keywords):
+            tokens = normalize_tokens(keyword)
+            if not tokens:
+                continue
+            self._vocabulary.update(tokens)
+            state = 0
+            for token in tokens:
+                next_state = self._goto[state].get(token)
+                if next_state is None:
+                    next_state = len(self._goto)
+                    self._goto.append({})
+                    self._fail.append(0)
+                    self._output.append([])
+                    self._goto[state][token] = next_state
+                state = next_state
+            self._output[state].append(keyword_id)
+        self._build_failure_links()
+
+    def _build_failure_links(self):
+        queue = deque(self._goto[0].values())
+        while queue:
+            state = queue.popleft()
+            for token, next_state in self._goto[state].items():
+                queue.append(next_state)
+                fallback = self._fail[state]
+                while fallback and token not in self._goto[fallback]:
+                    fallback = self._fail[fallback]
+                if state:
+                    self._fail[next_state] = self._goto[fallback].get(token, 0)
+                self._output[next_state] = self._output[next_state] + self._output[self._fail[next_state]]
+
+    # Nombre d'occurrences de chaque mot-clé dans le texte
+    def count(self, text):
+        counts = [0] * len(self.keywords)
+        goto, fail, output, vocabulary = self._goto, self._fail, self._output, self._vocabulary
+        state = 0
+        for token in normalize_tokens(text):
+            # Un mot absent de tous les mots-clés ramène directement à la racine
+            if token not in vocabulary:
+                state = 0
+                continue
+            while state and token not in goto[state]:
+                state = fail[state]
+            state = goto[state].get(token, 0)
+            for keyword_id in output[state]:
+                counts[keyword_id] += 1
+        return dict(zip(self.keywords, counts))
+
+
+# Automate réutilisé pour toutes les lignes partageant la même liste de mots-clés
+@lru_cache(maxsize=1024)
+def get_matcher(keywords):
+    return OccurrenceMatcher(keywords)
+
+
+# Score agrégé et détail par mot-clé
+def score_occurrences(revised_text, words_with_occurrences):
+    counts = get_matcher(tuple(words_with_occurrences)).count(revised_text or "")
+    total_required = sum(words_with_occurrences.values())
+    actual_count = sum(counts.values())
+    score = round((actual_count / total_required) * 100, 2) if total_required > 0 else 0
+    return score, counts
+
+
+# Fonction pour calculer le score d'occurrences
+def calculate_occurrence_score(revised_text, words_with_occurrences):
+    return score_occurrences(revised_text, words_with_occurrences)[0]
+
+
+# Recalculer en masse les scores d'une colonne de textes d'un DataFrame.
+# Renvoie deux séries alignées sur l'index : le score (NaN si les occurrences sont invalides) et le détail JSON.
+def rescore_column(df, text_column="Texte Révisé", occurrences_column="Occurrences"):
+    import pandas as pd
+
+    parsed = {}
+    scores = []
+    details = []
+    for revised_text, occurrences in zip(df[text_column], df[occurrences_column]):
+        if occurrences not in parsed:
+            try:
+                words_with_occurrences = json.loads(occurrences)
+                parsed[occurrences] = words_with_occurrences if isinstance(words_with_occurrences, dict) else None
+            except (TypeError, ValueError):
+                parsed[occurrences] = None
+        words_with_occurrences = parsed[occurrences]
+        if words_with_occurrences is None:
+            scores.append(float("nan"))
+            details.append("")
+            continue
+        score, counts = score_occurrences(revised_text if isinstance(revised_text, str) else "", words_with_occurrences)
+        scores.append(score)
+        details.append(json.dumps(counts, ensure_ascii=False))
+    return pd.Series(scores, index=df.index), pd.Series(details, index=df.index)
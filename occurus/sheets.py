@@ -0,0 +1,169 @@
+import csv
+import math
+
+# Nombre de lignes lues ou écrites à la fois : la mémoire dépend de cette taille, pas de celle du fichier
+CHUNK_SIZE = 500
+
+INPUT_FORMATS = ("xlsx", "csv")
+OUTPUT_FORMATS = ("xlsx", "csv", "parquet")
+
+MIME_TYPES = {
+    "xlsx": "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet",
+    "csv": "text/csv",
+    "parquet": "application/vnd.apache.parquet",
+}
+
+
+# Format d'un fichier d'après son nom (xlsx par défaut)
+def sheet_format(filename):
+    return "csv" if str(filename).lower().endswith(".csv") else "xlsx"
+
+
+def _rewind(source):
+    if hasattr(source, "seek"):
+        source.seek(0)
+
+
+def _iter_xlsx_rows(source):
+    from openpyxl import load_workbook
+
+    _rewind(source)
+    workbook = load_workbook(source, read_only=True, data_only=True)
+    try:
+        # Comme pandas.read_excel, les lignes vides au milieu de la feuille sont gardées (les numéros de ligne
+        # et l'export restent alignés sur le fichier) ; seules celles d'avant l'en-tête et de la fin sont écartées
+        blank_rows = []
+        started = False
+        for values in workbook.active.iter_rows(values_only=True):
+            if any(value is not None for value in values):
+                yield from blank_rows
+                blank_rows = []
+                started = True
+                yield values
+            elif started:
+                blank_rows.append(values)
+    finally:
+        workbook.close()
+
+
+# Noms des colonnes, sans lire le reste du fichier
+def read_header(source, file_format):
+    import pandas as pd
+
+    if file_format == "csv":
+        _rewind(source)
+        return list(pd.read_csv(source, nrows=0).columns)
+    for values in _iter_xlsx_rows(source):
+        return [str(value) for value in values]
+    return []
+
+
+# Lire le tableur par blocs de DataFrames dont l'index continue d'un bloc à l'autre
+# (openpyxl en lecture seule pour les xlsx, lecture par morceaux pour les csv).
+def iter_sheet_chunks(source, file_format, chunk_size=CHUNK_SIZE):
+    import pandas as pd
+
+    if file_format == "csv":
+        _rewind(source)
+        yield from pd.read_csv(source, chunksize=chunk_size)
+        return
+
+    rows = _iter_xlsx_rows(source)
+    header = [str(value) for value in next(rows, ())]
+    start = 0
+    buffer = []
+    for values in rows:
+        buffer.append(values[:len(header)])
+        if len(buffer) == chunk_size:
+            yield pd.DataFrame(buffer, columns=header, index=range(start, start + len(buffer)))
+            start += len(buffer)
+            buffer = []
+    if buffer:
+        yield pd.DataFrame(buffer, columns=header, index=range(start, start + len(buffer)))
+
+
+def _cell(value):
+    if value is None or (isinstance(value, float) and math.isnan(value)):
+        return ""
+    return value
+
+
+# Écriture incrémentale d'un tableur : chaque bloc est écrit puis libéré.
+# Le xlsx utilise le mode constant_memory de xlsxwriter, le Parquet un groupe de lignes par bloc (pyarrow requis).
+class SheetWriter:
+    def __init__(self, target, columns, file_format, numeric_columns=()):
+        self.columns = list(columns)
+        self.file_format = file_format
+        self.numeric_columns = set(numeric_columns)
+        self.rows_written = 0
+        if file_format == "xlsx":
+            import xlsxwriter
+
+            self._workbook = xlsxwriter.Workbook(target, {"constant_memory": True})
+            self._worksheet = self._workbook.add_worksheet()
+            self._worksheet.write_row(0, 0, self.columns)
+        elif file_format == "csv":
+            self._file = open(target, "w", encoding="utf-8-sig", newline="")
+            self._writer = csv.writer(self._file)
+            self._writer.writerow(self.columns)
+        elif file_format == "parquet":
+            try:
+                import pyarrow as pa
+                import pyarrow.parquet as pq
+            except ImportError as error:
+                raise ImportError("L'export Parquet nécessite le paquet pyarrow (pip install pyarrow).") from error
+            self._table_from_pandas = pa.Table.from_pandas
+            self._schema = pa.schema([
+                (column, pa.float64() if column in self.numeric_columns else pa.string())
+                for column in self.columns
+            ])
+            self._writer = pq.ParquetWriter(target, self._schema)
+        else:
+            raise ValueError(f"Format de sortie inconnu : {file_format}")
+
+    def write_chunk(self, chunk):
+        chunk = chunk.reindex(columns=self.columns)
+        if self.file_format == "parquet":
+            for column in self.columns:
+                if column in self.numeric_columns:
+                    chunk[column] = chunk[column].astype("float64")
+                else:
+                    chunk[column] = chunk[column].map(_cell).astype(str)
+            self._writer.write_table(self._table_from_pandas(chunk, schema=self._schema, preserve_index=False))
+        else:
+            for offset, values in enumerate(chunk.itertuples(index=False, name=None)):
+                values = [_cell(value) for value in values]
+                if self.file_format == "xlsx":
+                    self._worksheet.write_row(self.rows_written + offset + 1, 0, values)
+                else:
+                    self._writer.writerow(values)
+        self.rows_written += len(chunk)
+
+    def close(self):
+        if self.file_format == "xlsx":
+            self._workbook.close()
+        elif self.file_format == "csv":
+            self._file.close()
+        else:
+            self._writer.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+
+# Réécrire le tableur source avec les colonnes de résultats, bloc par bloc.
+# lookup(index) renvoie le résultat d'une ligne (dict de colonnes) ou None si elle n'a pas encore été traitée.
+def export_results(source, source_format, target, output_format, result_columns, lookup,
+                   numeric_columns=(), chunk_size=CHUNK_SIZE):
+    columns = read_header(source, source_format)
+    columns += [column for column in result_columns if column not in columns]
+    with SheetWriter(target, columns, output_format, numeric_columns) as writer:
+        for chunk in iter_sheet_chunks(source, source_format, chunk_size):
+            results = [lookup(index) or {} for index in chunk.index]
+            for column, default in result_columns.items():
+                chunk[column] = [result.get(column, default) for result in results]
+            writer.write_chunk(chunk)
+    return writer.rows_written
@@ -0,0 +1,80 @@
+import math
+import threading
+
+from occurus.prompts import TARGET_WORDS
+
+DEFAULT_MODEL = "gpt-4o-mini"
+
+# Estimation sans tiktoken : environ 3,5 caractères par token pour du français
+CHARS_PER_TOKEN = 3.5
+
+# Tokens par mot français (balises <h2>/<h3>/<p> comprises) et marge pour ne pas tronquer la réponse
+TOKENS_PER_WORD = 1.7
+COMPLETION_MARGIN = 1.4
+MIN_COMPLETION_TOKENS = 256
+MAX_COMPLETION_TOKENS = 4096
+
+# Taille maximale du texte source ('Text or not') envoyé au modèle, et traitement des textes trop longs
+MAX_SOURCE_TOKENS = 2000
+SOURCE_TRUNCATE = "truncate"
+SOURCE_REJECT = "reject"
+
+_encodings = {}
+_encodings_lock = threading.Lock()
+
+
+# Texte source refusé car plus long que MAX_SOURCE_TOKENS
+class SourceTooLong(ValueError):
+    pass
+
+
+# Encodeur tiktoken du modèle si le paquet (optionnel) est installé, sinon None
+def _encoding(model):
+    with _encodings_lock:
+        if model not in _encodings:
+            try:
+                import tiktoken
+            except ImportError:
+                _encodings[model] = None
+            else:
+                try:
+                    _encodings[model] = tiktoken.encoding_for_model(model)
+                except KeyError:
+                    _encodings[model] = tiktoken.get_encoding("o200k_base")
+        return _encodings[model]
+
+
+# Nombre de tokens d'un texte, exact avec tiktoken, estimé sinon
+def count_tokens(text, model=DEFAULT_MODEL):
+    encoding = _encoding(model)
+    if encoding is not None:
+        return len(encoding.encode(text))
+    return math.ceil(len(text) / CHARS_PER_TOKEN)
+
+
+def _clamp(max_tokens):
+    return max(MIN_COMPLETION_TOKENS, min(MAX_COMPLETION_TOKENS, max_tokens))
+
+
+# max_tokens d'une génération visant un nombre de mots donné (au lieu d'un plafond fixe)
+def max_tokens_for_words(words=TARGET_WORDS):
+    return _clamp(math.ceil(words * TOKENS_PER_WORD * COMPLETION_MARGIN))
+
+
+# max_tokens d'une réécriture (révision, correction) dont la réponse a à peu près la taille du texte fourni
+def max_tokens_for_text(text, model=DEFAULT_MODEL):
+    return _clamp(math.ceil(count_tokens(text, model) * COMPLETION_MARGIN))
+
+
+# Ramener un texte source sous max_tokens : tronqué (à une limite de mot sans tiktoken) ou refusé selon policy
+def fit_source_text(text, max_tokens=MAX_SOURCE_TOKENS, policy=SOURCE_TRUNCATE, model=DEFAULT_MODEL):
+    token_count = count_tokens(text, model)
+    if token_count <= max_tokens:
+        return text
+    if policy == SOURCE_REJECT:
+        raise SourceTooLong(f"Texte source trop long ({token_count} tokens, maximum {max_tokens}).")
+    encoding = _encoding(model)
+    if encoding is not None:
+        return encoding.decode(encoding.encode(text)[:max_tokens])
+    truncated = text[:int(max_tokens * CHARS_PER_TOKEN)]
+    return truncated.rsplit(None, 1)[0] if " " in truncated else truncated
@@ -0,0 +1,17 @@
+import requests
+
+
+# Réponse HTTP factice : corps chat/completions valide pour un 200, corps d'erreur de l'API sinon
+class FakeResponse:
+    def __init__(self, status_code=200, body=None, headers=None):
+        self.status_code = status_code
+        if body is None:
+            body = ({"choices": [{"message": {"content": "ok"}}]} if status_code == 200
+                    else {"error": {"message": "refusé"}})
+        self._body = body
+        self.headers = requests.structures.CaseInsensitiveDict(headers or {})
+        self.text = str(self._body)
+        self.reason = ""
+
+    def json(self):
+        return self._body
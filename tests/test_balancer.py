@@ -0,0 +1,81 @@
+import pytest
+
+from occurus import client
+from occurus.balancer import KeyPool, key_pool
+from occurus.client import LLMError
+from tests.fakes import FakeResponse
+
+PAYLOAD = {"model": "gpt-4o-mini", "messages": [{"role": "user", "content": "Bonjour"}], "max_tokens": 100}
+
+
+# Session factice qui répond selon la clé et le modèle de chaque requête ({(clé, modèle): statut}, 200 par défaut)
+class RoutedSession:
+    def __init__(self, statuses):
+        self.statuses = statuses
+        self.routes = []
+
+    def post(self, url, headers=None, json=None, timeout=None):
+        route = (headers["Authorization"].removeprefix("Bearer "), json["model"])
+        self.routes.append(route)
+        return FakeResponse(self.statuses.get(route, 200))
+
+
+@pytest.fixture(autouse=True)
+def no_sleep(monkeypatch):
+    monkeypatch.setattr(client.time, "sleep", lambda seconds: None)
+
+
+def post(pool, statuses):
+    session = RoutedSession(statuses)
+    call = {}
+    result = client._post_with_retries(session, "http://test/v1/chat/completions", {}, PAYLOAD, (1, 1), 3, call, pool)
+    return result, session.routes, call
+
+
+def test_route_with_the_most_headroom_is_chosen():
+    pool = KeyPool(["clé-a", "clé-b"])
+    busy = pool.acquire(PAYLOAD)
+    pool.observe(busy, FakeResponse(headers={
+        "x-ratelimit-limit-requests": "100", "x-ratelimit-remaining-requests": "5", "x-ratelimit-reset-requests": "1m"}))
+    assert all(pool.acquire(PAYLOAD).key != busy.key for _ in range(3))
+
+
+def test_rate_limited_route_fails_over_to_another_key():
+    _, routes, call = post(KeyPool(["clé-a", "clé-b"]), {("clé-a", "gpt-4o-mini"): 429})
+    assert routes == [("clé-a", "gpt-4o-mini"), ("clé-b", "gpt-4o-mini")]
+    assert call["status"] == 200
+
+
+def test_revoked_key_is_dropped_for_every_model():
+    pool = KeyPool(["clé-a", "clé-b"], fallback_models=["gpt-4o"])
+    post(pool, {("clé-a", "gpt-4o-mini"): 401})
+    assert [pool.acquire(PAYLOAD).key for _ in range(3)] == ["clé-b"] * 3
+    assert "refusée (HTTP 401)" in pool.disabled_routes()[0]
+
+
+def test_forbidden_model_falls_back_to_the_next_model():
+    pool = KeyPool(["clé-a"], fallback_models=["gpt-4o"])
+    _, routes, call = post(pool, {("clé-a", "gpt-4o-mini"): 403})
+    assert routes == [("clé-a", "gpt-4o-mini"), ("clé-a", "gpt-4o")]
+    assert call["model"] == "gpt-4o"
+
+
+def test_requested_model_is_preferred_over_fallbacks():
+    pool = KeyPool(["clé-a", "clé-b"], fallback_models=["gpt-4o"])
+    assert {pool.acquire(PAYLOAD).model for _ in range(4)} == {"gpt-4o-mini"}
+
+
+def test_all_keys_revoked_is_an_llm_error():
+    pool = KeyPool(["clé-a", "clé-b"])
+    with pytest.raises(LLMError) as error:
+        post(pool, {("clé-a", "gpt-4o-mini"): 401, ("clé-b", "gpt-4o-mini"): 401})
+    assert error.value.status == 401
+
+
+def test_key_pool_paces_even_a_single_key():
+    assert key_pool("") == ""
+    assert isinstance(key_pool("sk-1"), KeyPool)
+    assert isinstance(key_pool("sk-1, sk-2"), KeyPool)
+    assert isinstance(key_pool("sk-1", ["gpt-4o"]), KeyPool)
+    with pytest.raises(ValueError):
+        KeyPool(["", ""])
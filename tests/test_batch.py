@@ -0,0 +1,98 @@
+import json
+
+import pytest
+
+from occurus.batch import OpenAIBatchTransport, parse_batch_output, to_jsonl
+from occurus.jobs import JobJournal
+from occurus.mockserver import start_mock_server
+from occurus.pipeline import run_rows_in_batches
+
+
+@pytest.fixture
+def server():
+    server = start_mock_server(latency="fixed:0")
+    yield server
+    server.shutdown()
+    server.server_close()
+
+
+# Transport qui compte ses appels et peut s'interrompre avant le n-ième batch créé, comme un crash
+class CountingTransport(OpenAIBatchTransport):
+    def __init__(self, base_url, fail_on_batch=None):
+        super().__init__("clé", base_url)
+        self.uploads = 0
+        self.batches_created = 0
+        self.fail_on_batch = fail_on_batch
+
+    def upload(self, jsonl_text, filename="occurus_batch.jsonl"):
+        self.uploads += 1
+        return super().upload(jsonl_text, filename)
+
+    def create_batch(self, input_file_id):
+        if self.batches_created + 1 == self.fail_on_batch:
+            raise KeyboardInterrupt
+        self.batches_created += 1
+        return super().create_batch(input_file_id)
+
+
+JOBS = [
+    (0, "chaussure", "", {"cuir": 2}),
+    (3, "sac", "Un sac de randonnée.", {"sangle": 1}),
+    (7, "tente", "", {"arceau": 3}),
+]
+
+
+def test_batch_round_trip_through_the_mock_server(server):
+    transport = OpenAIBatchTransport("clé", server.base_url)
+    file_id = transport.upload(to_jsonl({"a": {"model": "m", "messages": [{"role": "user", "content": "bonjour"}]}}))
+    batch = transport.retrieve_batch(transport.create_batch(file_id)["id"])
+    assert batch["status"] == "completed" and batch["request_counts"]["completed"] == 1
+    results, errors = parse_batch_output(transport.download(batch["output_file_id"]))
+    assert list(results) == ["a"] and errors == {}
+
+
+def test_truncated_batch_replies_are_errors():
+    truncated = {"custom_id": "1", "response": {"status_code": 200, "body": {"choices": [
+        {"message": {"content": "coupé"}, "finish_reason": "length"}]}}}
+    results, errors = parse_batch_output(json.dumps(truncated))
+    assert results == {} and "tronquée" in errors["1"]
+
+
+def test_generation_review_and_merge_by_custom_id(server, tmp_path):
+    journal = JobJournal("lot", tmp_path)
+    results = dict(run_rows_in_batches(JOBS, 0.7, OpenAIBatchTransport("clé", server.base_url), journal,
+                                       poll_interval=0))
+    assert sorted(results) == [0, 3, 7]
+    for index, main_keyword, _, words_with_occurrences in JOBS:
+        assert results[index]['Statut'] == "OK"
+        assert f"<h2>{main_keyword}</h2>" in results[index]['Texte Révisé']
+        assert set(json.loads(results[index]['Détail Occurrences'])) == set(words_with_occurrences)
+    assert journal.scan()[1] == {0, 3, 7}
+    assert journal.batch_state() is None
+
+
+def test_interrupted_batches_are_resumed_without_resubmitting(server, tmp_path):
+    journal = JobJournal("lot", tmp_path)
+    # Arrêt juste avant de créer le batch de révision : la génération est déjà envoyée et payée
+    interrupted = CountingTransport(server.base_url, fail_on_batch=2)
+    with pytest.raises(KeyboardInterrupt):
+        list(run_rows_in_batches(JOBS, 0.7, interrupted, journal, poll_interval=0))
+    state = journal.batch_state()
+    assert state["stage"] == "review"
+    assert state["generation"][0]["batch_id"] and state["review"][0]["batch_id"] is None
+
+    resumed = CountingTransport(server.base_url)
+    results = dict(run_rows_in_batches(JOBS, 0.7, resumed, journal, poll_interval=0))
+    assert resumed.uploads == 0 and resumed.batches_created == 1
+    assert all(result['Statut'] == "OK" for result in results.values())
+    assert journal.batch_state() is None
+
+
+def test_batch_state_is_discarded_when_the_temperature_changes(server, tmp_path):
+    journal = JobJournal("lot", tmp_path)
+    with pytest.raises(KeyboardInterrupt):
+        list(run_rows_in_batches(JOBS, 0.7, CountingTransport(server.base_url, fail_on_batch=2), journal,
+                                 poll_interval=0))
+    restarted = CountingTransport(server.base_url)
+    list(run_rows_in_batches(JOBS, 0.2, restarted, journal, poll_interval=0))
+    assert restarted.uploads == 2
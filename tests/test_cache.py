@@ -0,0 +1,63 @@
+import pytest
+
+from occurus import cache as cache_module
+from occurus.cache import ResponseCache
+
+
+# Horloge factice avancée à la main par les tests
+@pytest.fixture
+def clock(monkeypatch):
+    now = [1_000_000.0]
+    monkeypatch.setattr(cache_module.time, "time", lambda: now[0])
+    return now
+
+
+def entries(cache):
+    return cache.stats()["entries"]
+
+
+def test_hits_and_misses_are_counted(tmp_path, clock):
+    cache = ResponseCache(str(tmp_path / "cache.sqlite"))
+    key = cache.make_key("http://test/v1/chat/completions", "gpt-4o-mini", "système", "prompt", 0.7, 700)
+    assert cache.get(key) is None
+    cache.set(key, "réponse")
+    assert cache.get(key) == "réponse" and cache.get(key) == "réponse"
+    assert cache.stats() == {"hits": 2, "misses": 1, "entries": 1}
+    cache.clear()
+    assert cache.stats() == {"hits": 0, "misses": 0, "entries": 0}
+
+
+def test_entries_expire_with_age(tmp_path, clock):
+    cache = ResponseCache(str(tmp_path / "cache.sqlite"), max_age=60)
+    cache.set("ancienne", "a")
+    clock[0] += 30
+    cache.set("récente", "b")
+    clock[0] += 31
+    assert cache.get("ancienne") is None and cache.get("récente") == "b"
+    assert (cache.hits, cache.misses) == (1, 1)
+    # L'entrée expirée n'est plus servie, puis elle est supprimée au nettoyage suivant
+    assert entries(cache) == 2
+    cache.evict()
+    assert entries(cache) == 1
+
+
+def test_least_recently_used_entries_are_trimmed_past_max_entries(tmp_path, clock):
+    cache = ResponseCache(str(tmp_path / "cache.sqlite"), max_entries=2)
+    for key in ("a", "b", "c"):
+        clock[0] += 1
+        cache.set(key, key)
+    clock[0] += 1
+    assert cache.get("a") == "a"  # « a » redevient la plus récemment utilisée
+    cache.evict()
+    assert entries(cache) == 2
+    assert cache.get("b") is None and cache.get("a") == "a" and cache.get("c") == "c"
+
+
+def test_writes_trigger_the_eviction_periodically(tmp_path, clock, monkeypatch):
+    monkeypatch.setattr(cache_module, "EVICT_EVERY", 2)
+    cache = ResponseCache(str(tmp_path / "cache.sqlite"), max_entries=1)
+    clock[0] += 1
+    cache.set("a", "a")
+    clock[0] += 1
+    cache.set("b", "b")
+    assert entries(cache) == 1 and cache.get("b") == "b"
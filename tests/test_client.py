@@ -0,0 +1,115 @@
+import pytest
+import requests
+
+from occurus import client
+from occurus.client import LLMError, backoff_delay, parse_duration, server_retry_delay
+from tests.fakes import FakeResponse
+
+
+# Session factice : chaque appel à post renvoie (ou lève) l'élément suivant de outcomes
+class FakeSession:
+    def __init__(self, outcomes):
+        self.outcomes = list(outcomes)
+        self.calls = 0
+
+    def post(self, url, headers=None, json=None, timeout=None):
+        self.calls += 1
+        outcome = self.outcomes.pop(0)
+        if isinstance(outcome, Exception):
+            raise outcome
+        return outcome
+
+
+@pytest.fixture(autouse=True)
+def no_sleep(monkeypatch):
+    monkeypatch.setattr(client.time, "sleep", lambda seconds: None)
+
+
+def post(outcomes, max_retries=3):
+    session = FakeSession(outcomes)
+    call = {}
+    try:
+        return client._post_with_retries(session, "http://test/v1/chat/completions", {}, {"model": "m"},
+                                         (1, 1), max_retries, call), session, call
+    except LLMError as error:
+        return error, session, call
+
+
+@pytest.mark.parametrize("value, expected", [
+    ("20ms", 0.02), ("1s", 1.0), ("6m0s", 360.0), ("1h2m3.5s", 3723.5), ("2.5", 2.5), ("", None), ("abc", None),
+])
+def test_parse_duration(value, expected):
+    if expected is None:
+        assert parse_duration(value) is None
+    else:
+        assert parse_duration(value) == pytest.approx(expected)
+
+
+def test_server_retry_delay_prefers_retry_after_ms():
+    response = FakeResponse(429, headers={"retry-after-ms": "1500", "retry-after": "9"})
+    assert server_retry_delay(response) == 1.5
+
+
+def test_server_retry_delay_uses_exhausted_ratelimit_reset():
+    response = FakeResponse(429, headers={
+        "x-ratelimit-remaining-requests": "0", "x-ratelimit-reset-requests": "2s",
+        "x-ratelimit-remaining-tokens": "10", "x-ratelimit-reset-tokens": "30s",
+    })
+    assert server_retry_delay(response) == 2.0
+    assert server_retry_delay(FakeResponse(500)) is None
+
+
+def test_backoff_delay_is_bounded():
+    for attempt in range(12):
+        assert 0 <= backoff_delay(attempt) <= client.BACKOFF_MAX
+
+
+def test_retries_transient_statuses_then_succeeds():
+    result, session, call = post([FakeResponse(503), FakeResponse(429), FakeResponse(200)])
+    assert result["choices"][0]["message"]["content"] == "ok"
+    assert session.calls == 3 and call["attempts"] == 3 and call["status"] == 200
+
+
+def test_non_retryable_status_fails_immediately():
+    error, session, _ = post([FakeResponse(400, body={"error": {"message": "mauvais"}})])
+    assert isinstance(error, LLMError) and error.status == 400 and "mauvais" in str(error)
+    assert session.calls == 1
+
+
+def test_gives_up_after_max_retries():
+    error, session, _ = post([FakeResponse(500)] * 3, max_retries=2)
+    assert isinstance(error, LLMError) and error.status == 500
+    assert session.calls == 3
+
+
+@pytest.mark.parametrize("exception", [
+    requests.ConnectionError("coupé"),
+    requests.Timeout("trop long"),
+    requests.exceptions.ChunkedEncodingError("corps tronqué"),
+])
+def test_transient_network_errors_are_retried(exception):
+    result, session, _ = post([exception, FakeResponse(200)])
+    assert not isinstance(result, LLMError)
+    assert session.calls == 2
+
+
+@pytest.mark.parametrize("exception", [
+    requests.exceptions.InvalidSchema("No connection adapters were found"),
+    requests.exceptions.MissingSchema("Invalid URL"),
+])
+def test_invalid_requests_become_llm_errors_without_retry(exception):
+    error, session, _ = post([exception, FakeResponse(200)])
+    assert isinstance(error, LLMError)
+    assert session.calls == 1
+
+
+def test_invalid_response_body_is_an_llm_error():
+    error, _, _ = post([FakeResponse(200, body={"choices": []})])
+    assert isinstance(error, LLMError)
+
+
+def test_bad_base_url_marks_the_row_failed():
+    from occurus.pipeline import process_row
+
+    result = process_row("chat", "", {"chat": 1}, "clé", 0.7, base_url="localhost:8000/v1")
+    assert result['Statut'].startswith("Échec")
@@ -0,0 +1,51 @@
+from occurus.jobs import JobJournal
+
+OK = {'Texte Révisé': "texte", 'Statut': "OK"}
+FAILED = {'Statut': "Échec : HTTP 500"}
+
+
+def test_truncated_last_line_is_skipped_and_recording_resumes(tmp_path):
+    journal = JobJournal("reprise", tmp_path)
+    journal.record(0, OK)
+    journal.record(1, OK)
+    # Arrêt brutal au milieu de l'écriture de la ligne 2
+    with open(journal.path, "ab") as journal_file:
+        journal_file.write(b'{"index": 2, "result": {"Texte R')
+    offsets, finished = journal.scan()
+    assert sorted(offsets) == [0, 1] and finished == {0, 1}
+
+    journal.record(2, OK)
+    offsets, finished = journal.scan()
+    assert finished == {0, 1, 2}
+    assert journal.read(offsets[2]) == OK
+
+
+def test_last_entry_for_a_row_wins(tmp_path):
+    journal = JobJournal("dernière", tmp_path)
+    journal.record(0, FAILED)
+    journal.record(1, OK)
+    journal.record(0, OK)
+    journal.record(1, FAILED)
+    offsets, finished = journal.scan()
+    assert finished == {0}
+    assert journal.read(offsets[0]) == OK and journal.read(offsets[1]) == FAILED
+
+
+def test_read_returns_the_entry_at_each_offset(tmp_path):
+    journal = JobJournal("positions", tmp_path)
+    results = {index: {'Texte Révisé': f"texte accentué {index}", 'Statut': "OK"} for index in (3, 0, 7)}
+    for index, result in results.items():
+        journal.record(index, result)
+    offsets, _ = journal.scan()
+    # Dans le désordre, avec le lecteur gardé ouvert entre deux appels
+    assert {index: journal.read(offsets[index]) for index in (7, 3, 0)} == results
+    journal.close()
+    assert journal.read(offsets[3]) == results[3]
+
+
+def test_missing_journal_is_empty_and_clear_removes_it(tmp_path):
+    journal = JobJournal("vide", tmp_path)
+    assert journal.scan() == ({}, set()) and journal.size() == 0
+    journal.record(0, OK)
+    journal.clear()
+    assert journal.scan() == ({}, set())
@@ -0,0 +1,93 @@
+import pytest
+
+from occurus import llm
+from occurus.cache import ResponseCache
+from occurus.client import LLMError
+from occurus.mockserver import start_mock_server
+from occurus.tokens import MAX_COMPLETION_TOKENS
+
+
+def reply(content, finish_reason="stop", model="gpt-4o-mini"):
+    return {"model": model, "choices": [{"message": {"content": content}, "finish_reason": finish_reason}]}
+
+
+# Remplace chat_completion : renvoie les réponses données dans l'ordre et garde les payloads envoyés
+@pytest.fixture
+def fake_api(monkeypatch):
+    def install(*replies):
+        payloads = []
+        queue = list(replies)
+
+        def chat_completion(payload, secret_key, url=None, call=None, **kwargs):
+            payloads.append(payload)
+            response_json = queue.pop(0)
+            if call is not None:
+                call["model"] = response_json["model"]
+            return response_json
+
+        monkeypatch.setattr(llm, "chat_completion", chat_completion)
+        return payloads
+    return install
+
+
+@pytest.fixture
+def cache(tmp_path):
+    return ResponseCache(str(tmp_path / "cache.sqlite"))
+
+
+def test_complete_reply_is_returned_and_cached(fake_api, cache):
+    payloads = fake_api(reply(" texte "))
+    assert llm.GPT35("prompt", "système", "clé", max_tokens=700, cache=cache) == "texte"
+    assert llm.GPT35("prompt", "système", "clé", max_tokens=700, cache=cache) == "texte"
+    assert len(payloads) == 1
+
+
+def test_cache_entries_are_kept_apart_per_base_url(fake_api, cache):
+    payloads = fake_api(reply("simulé"), reply("réel"))
+    assert llm.GPT35("prompt", "système", "clé", max_tokens=700, cache=cache,
+                     base_url="http://127.0.0.1:8000/v1") == "simulé"
+    assert llm.GPT35("prompt", "système", "clé", max_tokens=700, cache=cache) == "réel"
+    assert len(payloads) == 2
+
+
+def test_fallback_answer_is_cached_under_the_model_that_answered(fake_api, cache):
+    payloads = fake_api(reply("secours", model="gpt-4o"), reply("principal"))
+    assert llm.GPT35("prompt", "système", "clé", max_tokens=700, cache=cache) == "secours"
+    url = llm.chat_completions_url()
+    assert cache.get(cache.make_key(url, "gpt-4o", "système", "prompt", 0.7, 700)) == "secours"
+    assert llm.GPT35("prompt", "système", "clé", max_tokens=700, cache=cache) == "principal"
+    assert len(payloads) == 2
+
+
+def test_truncated_reply_is_retried_once_with_a_larger_budget(fake_api, cache):
+    payloads = fake_api(reply("coupé", "length"), reply("complet"))
+    assert llm.GPT35("prompt", "système", "clé", max_tokens=700, cache=cache) == "complet"
+    assert [payload["max_tokens"] for payload in payloads] == [700, 1400]
+
+
+def test_truncated_retry_fails_and_is_not_cached(fake_api, cache):
+    payloads = fake_api(reply("coupé", "length"), reply("encore coupé", "length"), reply("complet"))
+    with pytest.raises(LLMError, match="tronquée"):
+        llm.GPT35("prompt", "système", "clé", max_tokens=700, cache=cache)
+    assert len(payloads) == 2
+    assert llm.GPT35("prompt", "système", "clé", max_tokens=700, cache=cache) == "complet"
+
+
+def test_no_retry_when_the_budget_is_already_at_its_ceiling(fake_api):
+    payloads = fake_api(reply("coupé", "length"))
+    with pytest.raises(LLMError):
+        llm.GPT35("prompt", "système", "clé", max_tokens=MAX_COMPLETION_TOKENS)
+    assert len(payloads) == 1
+
+
+def test_each_call_reaches_its_own_base_url():
+    servers = [start_mock_server(latency="fixed:0") for _ in range(2)]
+    try:
+        for server, calls in zip(servers, (1, 2)):
+            for _ in range(calls):
+                llm.GPT35("Bonjour", "système", "clé", base_url=server.base_url)
+        assert [server.requests_served for server in servers] == [1, 2]
+    finally:
+        for server in servers:
+            server.shutdown()
+            server.server_close()
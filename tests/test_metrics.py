@@ -0,0 +1,68 @@
+import threading
+
+import pytest
+
+from occurus.metrics import MetricsRecorder, estimate_cost, recording
+from occurus.mockserver import start_mock_server
+from occurus.pipeline import run_rows_concurrently
+
+
+def recorder_with_calls():
+    recorder = MetricsRecorder(total_rows=2)
+    for latency in (0.5, 1.5):
+        recorder.record_call({"model": "gpt-4o-mini", "attempts": 1, "status": 200, "latency": latency, "usage": {
+            "prompt_tokens": 100, "completion_tokens": 20, "prompt_tokens_details": {"cached_tokens": 40}}})
+    recorder.record_row()
+    return recorder
+
+
+def samples(exposition):
+    return dict(line.rsplit(" ", 1) for line in exposition.splitlines() if not line.startswith("#"))
+
+
+def test_latency_is_exposed_as_a_summary():
+    exposition = recorder_with_calls().to_prometheus()
+    assert "# TYPE occurus_llm_latency_seconds summary" in exposition
+    values = samples(exposition)
+    assert float(values["occurus_llm_latency_seconds_sum"]) == 2.0
+    assert values["occurus_llm_latency_seconds_count"] == "2"
+    assert 'occurus_llm_latency_seconds{quantile="0.95"}' in values
+
+
+def test_cached_tokens_are_not_summed_with_billed_tokens():
+    values = samples(recorder_with_calls().to_prometheus())
+    billed = [float(value) for name, value in values.items() if name.startswith("occurus_tokens_total{")]
+    assert sum(billed) == 240
+    assert values["occurus_cached_prompt_tokens_total"] == "80"
+
+
+@pytest.mark.parametrize("model, expected", [("gpt-4o-mini", 0.75), ("gpt-4.1-mini", 2.0), ("gpt-4.1-nano", 0.5)])
+def test_fallback_models_have_their_own_prices(model, expected):
+    assert estimate_cost(model, {"prompt_tokens": 1_000_000, "completion_tokens": 1_000_000}) == pytest.approx(expected)
+
+
+# Deux traitements simultanés (deux sessions Streamlit) : chacun ne compte que ses propres appels,
+# y compris ceux faits par les threads de travail de run_rows_concurrently
+def test_concurrent_runs_do_not_share_their_recorders():
+    server = start_mock_server(latency="fixed:0.01")
+    recorders = {rows: MetricsRecorder(rows) for rows in (3, 5)}
+
+    def run(rows):
+        jobs = [(index, f"mot {index}", "", {"cuir": 1}) for index in range(rows)]
+        with recording(recorders[rows]):
+            for _ in run_rows_concurrently(jobs, "clé", 0.7, 2, base_url=server.base_url):
+                recorders[rows].record_row()
+
+    try:
+        threads = [threading.Thread(target=run, args=(rows,)) for rows in recorders]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+    finally:
+        server.shutdown()
+        server.server_close()
+    for rows, recorder in recorders.items():
+        snapshot = recorder.snapshot()
+        assert snapshot["rows"] == rows and snapshot["calls"] == 2 * rows
+        assert f"sur {2 * rows} requêtes" in recorder.usage_summary()
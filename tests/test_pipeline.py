@@ -0,0 +1,184 @@
+import csv
+import threading
+import time
+
+import pytest
+
+from occurus import pipeline
+from occurus.jobs import JobJournal
+from occurus.pipeline import adaptive_review
+
+
+# Remplace les appels LLM de la révision adaptative : la correction ajoute les mots manquants donnés,
+# la relecture complète renvoie le texte suivi de « relu »
+@pytest.fixture
+def fake_llm(monkeypatch):
+    calls = []
+
+    def correct(text, missing_keywords, *args):
+        calls.append("correction")
+        return text + " " + " ".join(word for word, (required, found) in missing_keywords.items()
+                                     for _ in range(required - found))
+
+    def review(text, *args, **kwargs):
+        calls.append("relecture")
+        return text + " relu"
+
+    monkeypatch.setattr(pipeline, "correct_missing_keywords", correct)
+    monkeypatch.setattr(pipeline, "review_content", review)
+    return calls
+
+
+def test_review_is_skipped_when_the_draft_reaches_the_threshold(fake_llm):
+    text, score, _, summary = adaptive_review("chat chat", {"chat": 2}, "clé", 0.7)
+    assert (text, score, summary) == ("chat chat", 100.0, "Ignorée (score atteint)")
+    assert fake_llm == []
+
+
+def test_targeted_corrections_until_the_threshold(fake_llm):
+    text, score, _, summary = adaptive_review("chat", {"chat": 2}, "clé", 0.7)
+    assert score == 100.0 and summary == "Corrections ciblées : 1"
+    assert fake_llm == ["correction"]
+
+
+def test_full_review_when_corrections_are_disabled(fake_llm):
+    text, score, _, summary = adaptive_review("chat", {"chat": 2}, "clé", 0.7, max_corrections=0)
+    assert summary == "Complète (seuil non atteint)"
+    assert text == "chat relu" and fake_llm == ["relecture"]
+
+
+def test_full_review_when_no_keyword_is_missing_but_the_threshold_is_above_100(fake_llm):
+    _, _, _, summary = adaptive_review("chat chat", {"chat": 2}, "clé", 0.7, score_threshold=150.0)
+    assert summary == "Complète (seuil non atteint)"
+    assert fake_llm == ["relecture"]
+
+
+def test_full_review_after_exhausted_corrections(monkeypatch, fake_llm):
+    monkeypatch.setattr(pipeline, "correct_missing_keywords", lambda text, *args: fake_llm.append("correction") or text)
+    _, score, _, summary = adaptive_review("chat", {"chat": 3}, "clé", 0.7, max_corrections=2)
+    assert summary == "Corrections ciblées : 2, puis complète (seuil non atteint)"
+    assert fake_llm == ["correction", "correction", "relecture"]
+
+
+@pytest.mark.parametrize("review_mode, max_corrections", [(pipeline.REVIEW_SYSTEMATIC, 2), (pipeline.REVIEW_ADAPTIVE, 0)])
+def test_heading_case_option_reaches_the_review(monkeypatch, review_mode, max_corrections):
+    options = []
+    monkeypatch.setattr(pipeline, "add_word_occurrences", lambda text, *args: "chat")
+    monkeypatch.setattr(pipeline, "review_content", lambda text, *args: options.append(args[3]) or text)
+    result = pipeline.process_row("chat", "", {"chat": 2}, "clé", 0.9, review_mode=review_mode,
+                                  max_corrections=max_corrections, fix_heading_case=False)
+    assert result['Statut'] == "OK" and options == [False]
+
+
+def write_sheet(path, rows):
+    with open(path, "w", encoding="utf-8", newline="") as output:
+        writer = csv.writer(output)
+        writer.writerow(["keyword", "Text or not", "Occurrences"])
+        writer.writerows(rows)
+    return str(path)
+
+
+@pytest.fixture
+def sheet(tmp_path):
+    return write_sheet(tmp_path / "lignes.csv", [
+        ["chaussure", "", '{"cuir": 2}'],          # 0 : représentante
+        ["sac", "", "{pas du json"],                # 1 : JSON invalide
+        ["", "", '{"cuir": 1}'],                    # 2 : mot clé manquant
+        ["tente", "", '{"arceau": "trois"}'],       # 3 : nombre non numérique
+        ["chaussure", "", '{"cuir": 2}'],          # 4 : doublon de 0
+        ["botte", "Un texte.", '{"cuir": 1}'],      # 5 : ligne unique
+        ["chaussure", "", '{"cuir": 2}'],          # 6 : doublon de 0
+    ])
+
+
+def test_preflight_reports_every_invalid_row_up_front(sheet):
+    report = pipeline.preflight(sheet, "csv")
+    assert report.rows == 7
+    messages = dict(report.errors)
+    assert sorted(messages) == [1, 2, 3]
+    assert "JSON" in messages[1] and "mot clé principal manquant" in messages[2] and "nombre" in messages[3]
+
+
+def test_preflight_collapses_identical_rows_into_one_job(sheet):
+    report = pipeline.preflight(sheet, "csv")
+    assert report.job_rows == {0, 5}
+    assert report.duplicates == {0: [4, 6]} and report.duplicate_rows == 2
+    assert [job[0] for job in pipeline.iter_jobs(sheet, "csv", only_rows=report.job_rows)] == [0, 5]
+    # Représentante déjà terminée : son premier doublon restant prend sa place
+    assert pipeline.preflight(sheet, "csv", finished_rows={0}).job_rows == {4, 5}
+
+
+def run_with_result(monkeypatch, sheet, tmp_path, result):
+    monkeypatch.setattr(pipeline, "process_row", lambda *args, **kwargs: dict(result))
+    report = pipeline.preflight(sheet, "csv")
+    journal = JobJournal("doublons", tmp_path)
+    jobs = pipeline.iter_jobs(sheet, "csv", only_rows=report.job_rows)
+    results = dict(pipeline.run_rows_concurrently(jobs, "clé", 0.7, 2, journal=journal, duplicates=report.duplicates))
+    offsets, finished = journal.scan()
+    return results, {index: journal.read(offset) for index, offset in offsets.items()}, finished
+
+
+def test_duplicates_receive_a_copy_of_the_result_without_cost(monkeypatch, sheet, tmp_path):
+    result = {'Texte Révisé': "texte", 'Statut': "OK", 'Durée (s)': 1.5, 'Appels LLM': 2,
+              'Tokens entrée': 100, 'Tokens sortie': 50}
+    results, journaled, finished = run_with_result(monkeypatch, sheet, tmp_path, result)
+    assert sorted(results) == [0, 4, 5, 6] and journaled == results and finished == {0, 4, 5, 6}
+    assert results[0] == result and 'Doublon de la ligne' not in results[5]
+    for duplicate in (4, 6):
+        assert results[duplicate] == {**result, 'Doublon de la ligne': 1, 'Durée (s)': 0.0, 'Appels LLM': 0,
+                                      'Tokens entrée': 0, 'Tokens sortie': 0}
+
+
+def test_failed_representative_marks_its_duplicates_failed(monkeypatch, sheet, tmp_path):
+    results, journaled, finished = run_with_result(monkeypatch, sheet, tmp_path, {'Statut': "Échec : HTTP 500"})
+    assert {index: result['Statut'] for index, result in journaled.items()} == dict.fromkeys([0, 4, 5, 6], "Échec : HTTP 500")
+    assert results[4]['Doublon de la ligne'] == 1 and finished == set()
+
+
+# Tâches factices : (index, mot clé, texte source, occurrences)
+def concurrent_jobs(indexes, pulled=None):
+    for index in indexes:
+        if pulled is not None:
+            pulled.append(index)
+        yield index, f"mot {index}", "", {"cuir": 1}
+
+
+def test_at_most_twice_max_workers_rows_are_in_flight(monkeypatch):
+    release = threading.Event()
+    monkeypatch.setattr(pipeline, "process_row", lambda *args, **kwargs: release.wait(5) and {'Statut': "OK"})
+    pulled = []
+    results = []
+    consumer = threading.Thread(target=lambda: results.extend(
+        pipeline.run_rows_concurrently(concurrent_jobs(range(20), pulled), "clé", 0.7, 2)))
+    consumer.start()
+    try:
+        time.sleep(0.2)
+        # Aucune ligne n'est terminée : le générateur n'a été lu que pour remplir la fenêtre
+        assert len(pulled) == 4 and results == []
+    finally:
+        release.set()
+        consumer.join(5)
+    assert sorted(index for index, _ in results) == list(range(20))
+
+
+def test_results_keep_the_index_of_their_row(monkeypatch):
+    monkeypatch.setattr(pipeline, "process_row", lambda main_keyword, *args, **kwargs: {'Statut': "OK", 'mot': main_keyword})
+    results = dict(pipeline.run_rows_concurrently(concurrent_jobs([12, 3, 7, 0]), "clé", 0.7, 3))
+    assert results == {index: {'Statut': "OK", 'mot': f"mot {index}"} for index in (12, 3, 7, 0)}
+
+
+def test_results_arrive_in_completion_order(monkeypatch):
+    fast_done = threading.Event()
+
+    # La ligne 0 ne se termine qu'après la ligne 1, soumise après elle
+    def process_row(main_keyword, *args, **kwargs):
+        if main_keyword == "mot 0":
+            fast_done.wait(5)
+            time.sleep(0.1)
+        else:
+            fast_done.set()
+        return {'Statut': "OK"}
+
+    monkeypatch.setattr(pipeline, "process_row", process_row)
+    results = pipeline.run_rows_concurrently(concurrent_jobs([0, 1]), "clé", 0.7, 2)
+    assert [index for index, _ in results] == [1, 0]
@@ -0,0 +1,114 @@
+import math
+
+import pytest
+
+from occurus.scoring import OccurrenceMatcher, calculate_occurrence_score, normalize_tokens, score_occurrences
+
+
+def count(keywords, text):
+    return OccurrenceMatcher(keywords).count(text)
+
+
+@pytest.mark.parametrize("text, expected", [
+    ("Le Château de l'Œuvre", ["le", "chateau", "de", "oeuvre"]),
+    # Les mots de trois lettres ou moins ne sont pas ramenés au singulier
+    ("Les chats, les journaux et les bateaux.", ["les", "chat", "les", "journal", "et", "les", "bateau"]),
+    ("jusqu'à l'arbre d'Anne", ["a", "arbre", "anne"]),
+    ("  bus   gaz  ", ["bus", "gaz"]),
+    ("", []),
+])
+def test_normalize_tokens(text, expected):
+    assert normalize_tokens(text) == expected
+
+
+def test_normalize_tokens_ignores_unicode_composition():
+    composed = "été"
+    decomposed = "été"
+    assert normalize_tokens(composed) == normalize_tokens(decomposed) == ["ete"]
+
+
+def test_whole_words_only():
+    assert count(["chat"], "Le château et le chaton regardent le chat.") == {"chat": 1}
+
+
+def test_case_accents_and_plurals_are_folded():
+    assert count(["Été"], "ete, ÉTÉ et étés") == {"Été": 3}
+    assert count(["journal"], "Un journal, des journaux.") == {"journal": 2}
+    assert count(["chapeau"], "Des chapeaux et un chapeau.") == {"chapeau": 2}
+
+
+def test_elisions_are_split_from_the_following_word():
+    assert count(["arbre", "eau"], "L'arbre boit l'eau d'un arbre qu'on aime.") == {"arbre": 2, "eau": 1}
+    assert count(["l'arbre"], "l'arbre et un arbre") == {"l'arbre": 2}
+
+
+@pytest.mark.parametrize("keyword, text, expected", [
+    ("t-shirt", "Un sweat-shirt", 0),
+    ("t-shirt", "Un T-shirt et deux t-shirts", 2),
+    ("vitamine d", "Riche en vitamine C", 0),
+    ("usb type c", "Un câble USB type A", 0),
+    ("usb type c", "Un câble USB type C", 1),
+    ("C++", "Du C++ et encore du c++", 2),
+    ("l'arbre", "L’arbre", 1),
+])
+def test_single_letters_are_kept_without_an_apostrophe(keyword, text, expected):
+    assert count([keyword], text) == {keyword: expected}
+
+
+def test_invariable_words_are_not_singularised():
+    assert count(["mai"], "Beau, mais fragile ; jamais mais toujours") == {"mai": 0}
+    assert count(["mais"], "mais, mais") == {"mais": 2}
+    assert count(["ver"], "Tourné vers le sud") == {"ver": 0}
+    assert normalize_tokens("temps fois corps") == ["temps", "fois", "corps"]
+
+
+def test_multi_word_keyword():
+    assert count(["chaussure de randonnée"], "Une chaussure de randonnée, des chaussures de randonnée, "
+                                             "une chaussure légère.") == {"chaussure de randonnée": 2}
+
+
+def test_overlapping_multi_word_keywords_are_all_counted():
+    keywords = ["chat noir", "noir et blanc", "chat noir et blanc", "blanc"]
+    assert count(keywords, "Un chat noir et blanc dort.") == {
+        "chat noir": 1, "noir et blanc": 1, "chat noir et blanc": 1, "blanc": 1,
+    }
+
+
+def test_failure_links_recover_partial_matches():
+    # « x y x y z » : l'échec de « x y x » doit repartir sur le suffixe « x y » pour trouver « x y z »
+    keywords = ["x y z", "y x y", "y z"]
+    assert count(keywords, "x y x y z") == {"x y z": 1, "y x y": 1, "y z": 1}
+
+
+def test_adjacent_repetitions_and_nested_keywords():
+    assert count(["bleu", "bleu bleu"], "bleu bleu bleu") == {"bleu": 3, "bleu bleu": 2}
+
+
+def test_unknown_words_reset_the_automaton():
+    assert count(["chat noir"], "chat très noir, chat noir") == {"chat noir": 1}
+
+
+def test_empty_or_punctuation_keyword_never_matches():
+    assert count(["", "!!", "chat"], "chat !! chat") == {"": 0, "!!": 0, "chat": 2}
+
+
+def test_score_occurrences():
+    score, counts = score_occurrences("Le chat et les chats du jardin.", {"chat": 2, "jardin": 2})
+    assert counts == {"chat": 2, "jardin": 1}
+    assert score == 75.0
+    assert calculate_occurrence_score(None, {"chat": 1}) == 0.0
+    assert score_occurrences("chat", {}) == (0, {})
+
+
+def test_rescore_column_handles_invalid_occurrences():
+    pd = pytest.importorskip("pandas")
+    from occurus.scoring import rescore_column
+
+    df = pd.DataFrame({
+        "Texte Révisé": ["un chat", None, "chat"],
+        "Occurrences": ['{"chat": 1}', '{"chat": 2}', "{invalide"],
+    }, index=[5, 6, 7])
+    scores, details = rescore_column(df)
+    assert list(scores.index) == [5, 6, 7]
+    assert scores[5] == 100.0 and scores[6] == 0.0 and math.isnan(scores[7])
+    assert details[5] == '{"chat": 1}' and details[7] == ""
@@ -0,0 +1,72 @@
+import csv
+
+import pandas as pd
+import pytest
+
+from occurus.sheets import export_results, iter_sheet_chunks, read_header
+
+HEADER = ["keyword", "Text or not", "Occurrences"]
+ROWS = [
+    ["chaussure", "Un texte.", '{"cuir": 2}'],
+    ["sac", None, '{"cuir": 1}'],
+    [None, None, None],                      # ligne vide au milieu de la feuille
+    ["botte", None, '{"cuir": 3}'],
+    ["tente", None, '{"arceau": 1}'],
+]
+RESULT_COLUMNS = {'Texte Révisé': "", 'Score Occurrences (%)': 0.0}
+RESULTS = {0: {'Texte Révisé': "revu 0", 'Score Occurrences (%)': 100.0},
+           3: {'Texte Révisé': "revu 3", 'Score Occurrences (%)': 50.0}}
+
+
+def write_xlsx(path, rows):
+    from openpyxl import Workbook
+
+    workbook = Workbook()
+    for values in [HEADER, *rows]:
+        workbook.active.append(values)
+    workbook.save(path)
+    return str(path)
+
+
+def write_csv(path, rows):
+    with open(path, "w", encoding="utf-8", newline="") as output:
+        writer = csv.writer(output)
+        writer.writerows([HEADER, *rows])
+    return str(path)
+
+
+@pytest.fixture(params=["xlsx", "csv"])
+def source(request, tmp_path):
+    writer = write_xlsx if request.param == "xlsx" else write_csv
+    return writer(tmp_path / f"lignes.{request.param}", ROWS), request.param
+
+
+def test_index_continues_across_chunks(source):
+    path, file_format = source
+    chunks = list(iter_sheet_chunks(path, file_format, chunk_size=2))
+    assert [list(chunk.index) for chunk in chunks] == [[0, 1], [2, 3], [4]]
+    assert list(pd.concat(chunks)['keyword'].fillna("")) == ["chaussure", "sac", "", "botte", "tente"]
+
+
+def test_blank_rows_are_kept_inside_the_sheet_like_read_excel(tmp_path):
+    path = write_xlsx(tmp_path / "lignes.xlsx", [*ROWS, [None, None, None], [None, None, None]])
+    chunks = pd.concat(iter_sheet_chunks(path, "xlsx", chunk_size=2))
+    expected = pd.read_excel(path)
+    assert list(chunks.index) == list(expected.index) == [0, 1, 2, 3, 4]
+    assert list(chunks['keyword'].fillna("")) == list(expected['keyword'].fillna(""))
+
+
+@pytest.mark.parametrize("output_format", ["xlsx", "csv", "parquet"])
+def test_export_results_adds_the_result_columns(source, tmp_path, output_format):
+    if output_format == "parquet":
+        pytest.importorskip("pyarrow")
+    path, file_format = source
+    target = str(tmp_path / f"export.{output_format}")
+    rows = export_results(path, file_format, target, output_format, RESULT_COLUMNS, RESULTS.get,
+                          numeric_columns=['Score Occurrences (%)'], chunk_size=2)
+    exported = {"xlsx": pd.read_excel, "csv": pd.read_csv, "parquet": pd.read_parquet}[output_format](target)
+    assert rows == len(exported) == len(ROWS)
+    assert list(exported.columns) == read_header(path, file_format) + list(RESULT_COLUMNS)
+    assert list(exported['keyword'].fillna("")) == ["chaussure", "sac", "", "botte", "tente"]
+    assert list(exported['Texte Révisé'].fillna("")) == ["revu 0", "", "", "revu 3", ""]
+    assert list(exported['Score Occurrences (%)']) == [100.0, 0.0, 0.0, 50.0, 0.0]